@@ -1 +1,2 @@
 from .runners import Noun  # ?
+from .fixtures import Fixture, fixture
@@ -0,0 +1,112 @@
+"""A disk-backed cache of runner results, evicted least-recently-used by size."""
+import hashlib
+import pickle
+import sqlite3
+import time
+
+
+def fingerprint(*parts):
+    """Return a hex digest of <parts>, each bytes or str."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))  # so parts can't run together
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def hash_file(filename):
+    """Return a digest of <filename>'s contents, or a marker if it's missing."""
+    try:
+        with open(filename, "rb") as source:
+            return fingerprint(source.read())
+    except FileNotFoundError:
+        return "missing"
+
+
+class ResultCache(object):
+
+    """
+    Pickled results stored under a fingerprint of everything they depend on.
+
+    Entries remember which runner (by identity) stored them, so a failure can
+    discard all of that runner's entries at once. When the stored values
+    exceed <limit> bytes, the least recently used entries are evicted.
+    """
+
+    path = ".anaphora-cache.db"
+    limit = 64 << 20
+
+    def __init__(self, path=None, limit=None):
+        if path is not None:
+            self.path = path
+        if limit is not None:
+            self.limit = limit
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS results(
+                key TEXT NOT NULL PRIMARY KEY,
+                runner TEXT,
+                value BLOB,
+                duration REAL,
+                size INTEGER,
+                used REAL
+            );
+        """
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_runner ON results(runner);")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results(used);")
+
+    def get(self, key):
+        """Return the (value, duration) stored under <key>, or None."""
+        row = self.db.execute(
+            "SELECT value, duration FROM results WHERE key=?;", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE results SET used=? WHERE key=?;", (time.time(), key))
+        return pickle.loads(row[0]), row[1]
+
+    def put(self, key, runner, value, duration):
+        """Store <value> under <key>; return False if it can't be pickled or won't fit."""
+        try:
+            data = pickle.dumps(value)
+        except Exception:  # pylint: disable=broad-except
+            return False
+        if len(data) > self.limit:
+            return False
+        self.db.execute("BEGIN;")
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, runner, value, duration, size, used) VALUES (?, ?, ?, ?, ?, ?);",
+                (key, runner, data, duration, len(data), time.time()),
+            )
+            self.evict()
+        except BaseException:
+            self.db.execute("ROLLBACK;")
+            raise
+        self.db.execute("COMMIT;")
+        return True
+
+    def evict(self):
+        """Delete the least recently used entries until we're within our limit."""
+        self.db.execute(
+            """DELETE FROM results WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, sum(size) OVER (ORDER BY used DESC, key) AS kept
+                    FROM results
+                ) WHERE kept > ?
+            );""",
+            (self.limit,),
+        )
+
+    def discard(self, runner):
+        """Forget every entry <runner> stored."""
+        self.db.execute("DELETE FROM results WHERE runner=?;", (runner,))
+
+    def size(self):
+        return self.db.execute("SELECT total(size) FROM results;").fetchone()[0]
+
+    def close(self):
+        self.db.close()
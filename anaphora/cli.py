@@ -19,6 +19,17 @@ class Stream(argparse.Action):  # pylint: disable=too-few-public-methods
             setattr(namespace, self.dest, Version(values))
 
 
+def shard(value):
+    """Parse "i/n" into (i, n), for running the i-th of n shards (1-based)."""
+    try:
+        index, count = map(int, value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected i/n, like 1/4")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("shard {} isn't between 1 and {}".format(index, count))
+    return index, count
+
+
 class CliConfig(Config):
     def __init__(self):
         super().__init__()
@@ -38,10 +49,73 @@ class CliConfig(Config):
         parser.add_argument(
             "-e", "--earmarks", nargs="?", const=sys.stdin, action=Stream
         )
+        parser.add_argument(
+            "--max-failures",
+            type=int,
+            metavar="N",
+            help="stop running tests once N unignored exceptions are recorded;\n"
+            + "the rest of the tree is still reported, as not run",
+        )
+        parser.add_argument(
+            "--cover",
+            nargs="*",
+            metavar="PATH",
+            help="record the lines each node runs in the results db, for files\n"
+            + "under PATHs (default: the working directory); anaphora's own\n"
+            + "files and installed packages only if a PATH is inside them",
+        )
+        parser.add_argument(
+            "--changed",
+            nargs="+",
+            metavar="FILE",
+            help="only run test modules that import (directly or not) one of\n"
+            + "FILEs; the rest are reported as skipped",
+        )
+        parser.add_argument(
+            "--changed-since",
+            metavar="REF",
+            help="like --changed, for files changed since git REF (or untracked)",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="run cached runners even if they have a result cached\n"
+            + "(results are still stored for next time)",
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=float,
+            metavar="MB",
+            help="evict least recently used cached results past MB (default: 64)",
+        )
+        parser.add_argument(
+            "--last-failed",
+            nargs="?",
+            const=True,
+            metavar="DB",
+            help="run only what failed in a saved results db (default: the one\n"
+            + "--save writes for this module), plus their ancestors",
+        )
+        parser.add_argument(
+            "--failed-first",
+            nargs="?",
+            const=True,
+            metavar="DB",
+            help="like --last-failed, but run everything, putting runners that\n"
+            + "failed (or contain failures) first in their collections",
+        )
+        parser.add_argument(
+            "-x",
+            "--exitfirst",
+            dest="max_failures",
+            action="store_const",
+            const=1,
+            help="stop after the first unignored exception (--max-failures 1)",
+        )
         save_choices = {
             "archive": "save with datestamp in file name",
             "replace": "save only most-recent run",
-            "track": "Pending: save all runs in one db",
+            "track": "save all runs in one db",
         }
         parser.add_argument(
             "-s",
@@ -55,6 +129,76 @@ class CliConfig(Config):
                 ]
             ),
         )
+        parser.add_argument(
+            "--store",
+            choices=("sqlite", "columnar"),
+            default="sqlite",
+            help="keep nodes in sqlite rows, or in numpy arrays that are only\n"
+            + "exported to sqlite when queried or saved (requires numpy)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=float,
+            metavar="SECONDS",
+            help="with --save, also write results to disk every SECONDS during the run",
+        )
+        parser.add_argument(
+            "--shard",
+            type=shard,
+            metavar="I/N",
+            help="run only the I-th of N shards of the suite; top-level nodes\n"
+            + "and collection items are assigned to shards by their keys",
+        )
+        parser.add_argument(
+            "--shard-timings",
+            metavar="DB",
+            help="with --shard, balance shards by each unit's runtime in a\n"
+            + "saved results db (merge every shard's db to use them all)",
+        )
+        parser.add_argument(
+            "--shard-default",
+            type=float,
+            metavar="SECONDS",
+            help="with --shard-timings, runtime to assume for units it lacks\n"
+            + "(default: their mean)",
+        )
+        parser.add_argument(
+            "--static-discovery",
+            action="store_true",
+            help="select functions and classes by parsing modules (cached in\n"
+            + ".anaphora-index.json) and import only modules with selected tests",
+        )
+        parser.add_argument(
+            "--command-timeout",
+            type=float,
+            metavar="SECONDS",
+            help="kill commands (and everything they started) after SECONDS",
+        )
+        parser.add_argument(
+            "-b",
+            "--buffer",
+            nargs="?",
+            const=1000,
+            type=int,
+            metavar="ROWS",
+            help="queue database writes and flush them in batches of ROWS (default: 1000)",
+        )
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            metavar="SECONDS",
+            help="also flush buffered writes once SECONDS have passed",
+        )
+        parser.add_argument(
+            "-w",
+            "--writer",
+            nargs="?",
+            const=64,
+            type=int,
+            metavar="BATCHES",
+            help="apply buffered writes and checkpoints on a background thread,\n"
+            + "queueing at most BATCHES before the test thread waits (default: 64)",
+        )
         self.update(parser.parse_args().__dict__)
 
 
@@ -79,6 +223,8 @@ class CliRun(Noun):
     def __exit__(self, exception_type, exception_value, tb):
         """replace Noun.__exit__, handle errors, report, clean up."""
         self.hooks.run(self.hooks.AFTER)
+        self.tear_down()
+        self.coverage.end()
         out = 0
         if exception_value:
             if isinstance(exception_value, (KeyError, TypeError, ImportError)):
@@ -129,6 +275,8 @@ class CliRun(Noun):
         Note that while the module object is returned, there is no
         obvious use case for keeping the reference at this time.
         """
+        if not self.affected(self.options.module):
+            return None
         return __import__(self.options.module, {}, locals(), [], 0)
 
 
@@ -0,0 +1,267 @@
+"""Array-backed node storage for runs too large for a row per node."""
+import sqlite3
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .db import QueryAPI
+
+
+class GrowableArray(object):
+
+    """A typed numpy array that doubles its capacity as values are appended."""
+
+    def __init__(self, dtype, fill=0):
+        self.fill = fill
+        self.data = numpy.full(1024, fill, dtype=dtype)
+        self.size = 0
+
+    def append(self, value):
+        if self.size == len(self.data):
+            grown = numpy.full(len(self.data) * 2, self.fill, dtype=self.data.dtype)
+            grown[: self.size] = self.data
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+
+    def __setitem__(self, index, value):
+        self.data[index] = value
+
+    @property
+    def values(self):
+        return self.data[: self.size]
+
+
+class ColumnarQueryAPI(QueryAPI):
+
+    """
+    QueryAPI that keeps nodes in typed arrays instead of sqlite rows.
+
+    Node ids, parent ids, noun ids, depths and each tracked stat live in
+    growable numpy arrays indexed by node id. Child aggregates, depth counts
+    and subtree selection are computed with vectorized numpy operations.
+    Nodes stay in the arrays while the run writes them: they're exported to
+    the usual sqlite schema only when something asks for SQL (any
+    execute(), which includes the rest of the QueryAPI) or the run is
+    persisted (--save). Each export recomputes every child aggregate in one
+    pass and writes the rows added or changed since the last one. Nouns and
+    exceptions are few, so they still go straight to sqlite.
+
+    Select it with --store columnar; it requires numpy.
+    """
+
+    arrays = None
+    stats = None
+    descriptions = None
+    dirty = None
+    export_sql = None
+
+    def __init__(self, options):
+        if numpy is None:
+            raise ImportError("the columnar store requires numpy")
+        super().__init__(options)
+        # exceptions reference nodes that may not have been exported yet
+        sqlite3.Connection.execute(self, "PRAGMA foreign_keys=OFF;")
+        self.arrays = {
+            "parent_id": GrowableArray(numpy.int64),
+            "noun_id": GrowableArray(numpy.int64),
+            "depth": GrowableArray(numpy.int32),
+            "updated": GrowableArray(numpy.bool_, False),
+        }
+        self.stats = {}
+        self.descriptions = []
+        self.paths = []
+        self.keys = []
+        self.units = []
+        self.dirty = set()  # indexes of rows added or updated since the last export
+
+    def track_stats(self, stats):
+        super().track_stats(stats)
+        names = [stat.name for stat in stats]
+        # per stat: values, and child aggregates as of the last export
+        self.stats = {
+            name: (GrowableArray(numpy.float64), GrowableArray(numpy.float64))
+            for name in names
+        }
+        self.export_sql = "INSERT OR REPLACE INTO nodes (id, description, parent_id, noun_id, depth, path, key, unit, {}) VALUES ({});".format(
+            ", ".join("{name}, child_{name}".format(name=name) for name in names),
+            ", ".join("?" * (8 + 2 * len(names))),
+        )
+
+    def buffered(self):
+        return bool(self.dirty) or super().buffered()
+
+    def add_node(self, node):
+        node_id = self.next_id("nodes")
+        parent = node.parent
+        for array in self.arrays.values():
+            array.append(0)
+        self.arrays["parent_id"][node_id - 1] = parent.id if parent else 0
+        self.arrays["noun_id"][node_id - 1] = node.__class__.id
+        self.arrays["depth"][node_id - 1] = node.depth
+        for columns in self.stats.values():
+            for column in columns:
+                column.append(0)
+        self.descriptions.append(node.description)
+        self.paths.append(node.path_to(node_id))
+        self.keys.append(node.key)
+        self.units.append(node.unit)
+        self.dirty.add(node_id - 1)
+        return node_id
+
+    def update_node(self, node):
+        self.add_coverage(node)
+        index = node.id - 1
+        for stat in self.tracked_stats:
+            value = stat.compute(node)
+            # NaN stands in for NULL (e.g. a skipped node's succeeded)
+            self.stats[stat.name][0][index] = numpy.nan if value is None else value
+        self.arrays["updated"][index] = True
+        self.dirty.add(index)
+        self.checkpoint()
+
+    def aggregate(self):
+        """
+        Return each stat's child aggregates for every node, as Stat.aggregate would.
+
+        Finished (updated) nodes are folded into their parents level by
+        level, deepest first, whenever they finished. Nodes with no finished
+        children get NaN (NULL), or 0 while they haven't finished themselves
+        (the column default the row store leaves them at).
+        """
+        size = len(self.descriptions)
+        parents = self.arrays["parent_id"].values - 1
+        depths = self.arrays["depth"].values
+        updated = self.arrays["updated"].values
+        order = numpy.argsort(depths, kind="stable")
+        levels = numpy.split(order, numpy.flatnonzero(numpy.diff(depths[order])) + 1)
+        children = numpy.zeros(size, dtype=numpy.int64)
+        for level in levels:
+            level = level[updated[level] & (parents[level] >= 0)]
+            numpy.add.at(children, parents[level], 1)
+        aggregates = {}
+        for stat in self.tracked_stats:
+            values = self.stats[stat.name][0].values
+            value_total = numpy.zeros(size)
+            child_total = numpy.zeros(size)
+            child_seen = numpy.zeros(size, dtype=numpy.int64)
+            child = numpy.zeros(size)
+            for level in reversed(levels):
+                if stat.aggregator == "all":
+                    settled = child_total[level] + value_total[level]
+                else:
+                    settled = numpy.where(
+                        child_seen[level] > 0, child_total[level], value_total[level]
+                    )
+                child[level] = numpy.where(
+                    children[level] > 0,
+                    settled,
+                    numpy.where(updated[level], numpy.nan, 0),
+                )
+                level = level[updated[level] & (parents[level] >= 0)]
+                into = parents[level]
+                seen = ~numpy.isnan(child[level])
+                numpy.add.at(value_total, into, numpy.nan_to_num(values[level]))
+                numpy.add.at(child_total, into, numpy.where(seen, child[level], 0))
+                numpy.add.at(child_seen, into, seen)
+            aggregates[stat.name] = child
+        return aggregates
+
+    @staticmethod
+    def nullable(values):
+        return [None if value != value else value for value in values.tolist()]
+
+    def export(self):
+        """Queue the rows added or changed since the last export as sqlite writes."""
+        changed = numpy.zeros(len(self.descriptions), dtype=numpy.bool_)
+        changed[list(self.dirty)] = True
+        self.dirty.clear()
+        for name, child in self.aggregate().items():
+            exported = self.stats[name][1].values
+            changed |= ~((child == exported) | (numpy.isnan(child) & numpy.isnan(exported)))
+            exported[:] = child
+        rows = numpy.flatnonzero(changed)
+        if not len(rows):
+            return
+        columns = [
+            (rows + 1).tolist(),
+            [self.descriptions[index] for index in rows.tolist()],
+            [parent or None for parent in self.arrays["parent_id"].values[rows].tolist()],
+            self.arrays["noun_id"].values[rows].tolist(),
+            self.arrays["depth"].values[rows].tolist(),
+            [self.paths[index] for index in rows.tolist()],
+            [self.keys[index] for index in rows.tolist()],
+            [self.units[index] for index in rows.tolist()],
+        ]
+        for stat in self.tracked_stats:
+            for column in self.stats[stat.name]:
+                columns.append(self.nullable(column.values[rows]))
+        self.pending.setdefault(self.export_sql, []).extend(zip(*columns))
+        self.pending_rows += len(rows)
+
+    def execute(self, *args):  # pylint: disable=arguments-differ
+        """Export our rows first, so SQL sees them; see QueryAPI.execute."""
+        if self.dirty and (
+            self.writer is None or threading.current_thread() is not self.writer
+        ):
+            self.export()
+        return super().execute(*args)
+
+    def persist(self, final=False):
+        if self.dbname is not None and self.dirty:
+            self.export()
+        super().persist(final)
+
+    def subtree(self, node_id):
+        """Return a boolean mask selecting :node_id: and its descendants."""
+        parents = self.arrays["parent_id"].values - 1
+        depths = self.arrays["depth"].values
+        mask = numpy.zeros(len(parents), dtype=numpy.bool_)
+        mask[node_id - 1] = True
+        for depth in range(int(depths[node_id - 1]) + 1, int(depths.max()) + 1):
+            level = numpy.flatnonzero(depths == depth)
+            mask[level] = mask[parents[level]]
+        return mask
+
+    def table(self, names, values):
+        """Return a cursor over <values> as sqlite3.Rows with columns <names>."""
+        columns = ", ".join(
+            "column{} AS {}".format(index, name) for index, name in enumerate(names, 1)
+        )
+        if not values:
+            return self.execute(
+                "SELECT {} FROM (VALUES ({})) LIMIT 0;".format(
+                    columns, ", ".join(["NULL"] * len(names))
+                )
+            )
+        return self.execute(
+            "SELECT {} FROM (VALUES {});".format(
+                columns,
+                ", ".join(["({})".format(", ".join("?" * len(names)))] * len(values)),
+            ),
+            [value for row in values for value in row],
+        )
+
+    def depths(self, node_id=None):
+        """
+        Return iterator over each distinct depth and the number of nodes at that depth.
+        """
+        node_id = node_id or 1
+        depths = self.arrays["depth"].values
+        counts = numpy.bincount(depths[self.subtree(node_id)] - depths[node_id - 1])
+        return self.table(
+            ("depth", "count"),
+            [(depth, int(count)) for depth, count in enumerate(counts) if count],
+        )
+
+    def depth(self, node_id=None, depth=0):
+        """
+        Return the number of nodes that were found at a given :depth:.
+        """
+        for row in self.depths(node_id):
+            if row["depth"] == depth:
+                return row
+        return None
@@ -1,47 +1,140 @@
-"""Wrapper for interfacing with coverage.py."""
-
-from coverage.report import Reporter
-from coverage.results import Numbers
-
-# LATERDO: figure out why I had this # from coverage.misc import NotPython
-
-
-class Dict(Reporter):
-
-    """A reporter for writing the summary report."""
-
-    def __init__(self, cover_ob, config):
-        super().__init__(cover_ob, config)
-        self.branches = cover_ob.data.has_arcs()
-
-    def statistics(self, morfs):
-        """Return a dictionary of coverage statistics."""
-        self.find_code_units(morfs)
-        # names = [cu.name for cu in self.code_units]
-        total = Numbers()
-        output = {}
-
-        # print(self.code_units)
-        for code_unit in self.code_units:
-            analysis = self.coverage._analyze(
-                code_unit
-            )  # pylint: disable=protected-access
-            nums = analysis.numbers
-            output[code_unit.name] = {
-                "statements": nums.n_statements,
-                "missing": nums.n_missing,
-                "branches": nums.n_branches,
-                "missing_branches": nums.n_missing_branches,
-                "coverage": nums.pc_covered,
-                "miss": analysis.missing_formatted(),
-            }
-            total += nums
-        output["total"] = {
-            "statements": total.n_statements,
-            "missing": total.n_missing,
-            "branches": total.n_branches,
-            "missing_branches": total.n_missing_branches,
-            "coverage": total.pc_covered,
-        }
-
-        return output
+"""Attribute executed lines to the innermost running node (--cover)."""
+import os
+import sys
+
+ANAPHORA = os.path.dirname(os.path.abspath(__file__))
+# third-party code is only covered if a source asks for it by path
+PACKAGES = (os.sep + "site-packages" + os.sep, os.sep + "dist-packages" + os.sep)
+
+TRACER = None  # the run's Tracer, while --cover is on; see configure
+
+
+def within(path, directory):
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class Tracer(object):
+
+    """
+    Record which lines run while each node is the innermost one.
+
+    Nodes push a bucket ({filename: set of line numbers}) when they start
+    and pop it when they end; lines land in the bucket on top. On 3.12+ we
+    use sys.monitoring: each line disables itself after it fires, and events
+    are restarted whenever the innermost node changes, so a line costs one
+    callback per node no matter how often it runs. Older pythons fall back
+    to a settrace function, which only traces frames in included files.
+
+    Only files under <sources> are recorded. Anaphora's own files and
+    installed packages are left out unless a source points inside them.
+    """
+
+    monitoring = getattr(sys, "monitoring", None)
+    tool = None  # our sys.monitoring tool id, while we hold one
+
+    def __init__(self, sources):
+        self.sources = [os.path.abspath(source) for source in sources or [os.getcwd()]]
+        self.stack = []
+        self.included = {}  # filename: whether we record it
+
+    def include(self, filename):
+        included = self.included.get(filename)
+        if included is None:
+            path = os.path.abspath(filename)
+            included = self.included[filename] = any(
+                within(path, source)
+                and (within(source, ANAPHORA) or not within(path, ANAPHORA))
+                and not any(
+                    package in path and package not in source + os.sep
+                    for package in PACKAGES
+                )
+                for source in self.sources
+            )
+        return included
+
+    def start(self):
+        if self.monitoring is not None:
+            try:
+                self.monitoring.use_tool_id(self.monitoring.COVERAGE_ID, "anaphora")
+            except ValueError:
+                pass  # someone else (coverage.py?) is monitoring; use settrace
+            else:
+                self.tool = self.monitoring.COVERAGE_ID
+                events = self.monitoring.events
+                self.monitoring.register_callback(self.tool, events.LINE, self.line)
+                self.monitoring.set_events(self.tool, events.LINE)
+                return
+        sys.settrace(self.trace)
+        # frames already running only trace their lines if we tell them to
+        frame = sys._getframe(1)  # pylint: disable=protected-access
+        while frame is not None:
+            if self.include(frame.f_code.co_filename):
+                frame.f_trace = self.trace_lines
+            frame = frame.f_back
+
+    def stop(self):
+        if self.tool is not None:
+            self.monitoring.set_events(self.tool, 0)
+            self.monitoring.register_callback(self.tool, self.monitoring.events.LINE, None)
+            self.monitoring.free_tool_id(self.tool)
+            self.tool = None
+        elif sys.gettrace() == self.trace:
+            sys.settrace(None)
+        self.stack = []
+
+    def push(self, bucket):
+        self.stack.append(bucket)
+        if self.tool is not None:
+            self.monitoring.restart_events()
+
+    def pop(self, bucket):
+        """Stop recording into <bucket>, wherever it is (timeouts unwind several)."""
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index] is bucket:
+                del self.stack[index]
+                if self.tool is not None:
+                    self.monitoring.restart_events()
+                return
+
+    def line(self, code, number):
+        """sys.monitoring LINE callback."""
+        if self.stack and number > 0 and self.include(code.co_filename):
+            self.stack[-1].setdefault(code.co_filename, set()).add(number)
+        return self.monitoring.DISABLE
+
+    def trace(self, frame, event, arg):  # pylint: disable=unused-argument
+        """Global settrace function; only trace lines in included files."""
+        if self.include(frame.f_code.co_filename):
+            return self.trace_lines
+        return None
+
+    def trace_lines(self, frame, event, arg):  # pylint: disable=unused-argument
+        if event == "line" and self.stack and frame.f_lineno > 0:
+            self.stack[-1].setdefault(frame.f_code.co_filename, set()).add(
+                frame.f_lineno
+            )
+        return self.trace_lines
+
+
+def configure(sources):
+    """Start tracing files under <sources> ([] for the working directory), or stop if None."""
+    global TRACER  # pylint: disable=global-statement
+    if TRACER is not None:
+        TRACER.stop()
+        TRACER = None
+    if sources is not None:
+        TRACER = Tracer(sources)
+        TRACER.start()
+
+
+def bitmap(numbers):
+    """Return line <numbers> as bytes with bit n (little-endian) set for line n."""
+    value = 0
+    for line in numbers:
+        value |= 1 << line
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def lines(value):
+    """Return the sorted line numbers set in a bitmap, read with int.from_bytes(data, "little")."""
+    return [line for line in range(value.bit_length()) if value >> line & 1]
@@ -1,18 +1,134 @@
+import datetime
+import functools
+import hashlib
+import json
+import queue
+import socket
 import sqlite3
+import subprocess
+import threading
+import time
+import urllib.parse
+import zlib
+from . import cover
 from .stats import Stat
 
 sql = None  # pylint: disable=invalid-name
 
 
+def inflate(data, compressed):
+    """Return payload text from its stored bytes; registered as an sql function."""
+    if data is None:
+        return None
+    return (zlib.decompress(data) if compressed else data).decode("utf-8")
+
+
+def connect(options):
+    """Return the results db selected by <options>; this also sets db.sql."""
+    if options and options.get("store") == "columnar":
+        from .columnar import ColumnarQueryAPI
+
+        return ColumnarQueryAPI(options)
+    return QueryAPI(options)
+
+
+class Writer(threading.Thread):
+
+    """
+    Apply queued database work on a dedicated thread.
+
+    Work is any callable. The queue is bounded, so put() blocks (applying
+    backpressure to the test thread) once it holds <size> items. After an
+    error on the writer thread, later work is skipped (it may depend on what
+    failed), and the error is re-raised on the caller's thread by every
+    put(), wait() and stop() from then on, so no batch is dropped silently.
+    """
+
+    error = None
+
+    def __init__(self, size):
+        super().__init__(name="anaphora-db-writer", daemon=True)
+        self.queue = queue.Queue(size)
+        self.start()
+
+    def run(self):
+        while True:
+            work = self.queue.get()
+            try:
+                if work is None:
+                    return
+                if self.error is None:
+                    work()
+            except BaseException as exc:  # pylint: disable=broad-except
+                self.error = exc
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, work):
+        self.check()
+        self.queue.put(work)
+
+    def wait(self):
+        """Block until everything queued so far has been applied."""
+        self.queue.join()
+        self.check()
+
+    def stop(self):
+        """Drain the queue and end the thread."""
+        self.queue.put(None)
+        self.join()
+        self.check()
+
+
 class OurDb(sqlite3.Connection):
     tracked_stats = None
+    # write buffering is off unless buffer_size is set; see write()
+    buffer_size = 0
+    flush_interval = None
+    # we always run in memory; dbname is where save modes persist to
+    dbname = None
+    checkpoint_interval = None
+    # with --save track, the history file is attached under this schema name
+    tracking = False
+    history_run_id = None
+    pending = None
+    pending_rows = 0
+    writer = None
+    add_noun_sql = "INSERT INTO nouns (id, name) VALUES (?, ?);"
+    add_node_sql = "INSERT INTO nodes (id, description, parent_id, noun_id, depth, path, key, unit) VALUES (?, ?, ?, ?, ?, ?, ?, ?);"
+    add_payload_sql = "INSERT OR IGNORE INTO payloads (hash, zlib, data) VALUES (?, ?, ?);"
+    add_file_sql = "INSERT INTO files (id, path) VALUES (?, ?);"
+    add_coverage_sql = "INSERT INTO coverage (node_id, file_id, lines) VALUES (?, ?, ?);"
+    # payloads at least this many bytes long are stored zlib-compressed
+    compress_threshold = 512
     # pylint: disable=no-member
 
     def __init__(self, options):
         global sql  # pylint: disable=global-statement,invalid-name
         sql = self  # pylint: disable=invalid-name
 
-        dbname = None
+        # we hand out our own row ids so that buffered inserts don't need a
+        # round-trip to learn them
+        self.last_id = {"nodes": 0, "nouns": 0, "files": 0}
+        self.payloads = set()  # hashes we've already queued
+        self.files = {}  # covered filenames: their ids
+        self.pending = None
+        self.pending_rows = 0
+        self.clear_pending()
+        if options:
+            self.buffer_size = options.get("buffer") or 0
+            self.flush_interval = options.get("flush_interval")
+            self.checkpoint_interval = options.get("checkpoint")
+        self.checkpointed_at = time.monotonic()
+        writer_queue = options.get("writer") if options else None
+        if writer_queue and not self.buffer_size:
+            # the writer works on batches, so it implies buffering
+            self.buffer_size = 1000
+
         if options and options.save:
             if options.module:
                 dbname = options.module
@@ -20,31 +136,28 @@ class OurDb(sqlite3.Connection):
                 dbname = "anaphora"
 
             if options.save == "archive":
-                import time
-
                 dbname += "-" + time.ctime()
 
-            dbname += ".db"
+            # "replace" needs no special handling: persist() overwrites the file
+            if options.save == "track":
+                dbname += "-track"
+                self.tracking = True
 
-            if options.save == "replace":
-                try:
-                    import os
-
-                    os.remove(dbname)
-                except FileNotFoundError:
-                    pass
-            elif options.save == "track":
-                # LATERDO something cute to create a schema for tracking runs
-                reason = "longitudinal tracking in a single database isn't implemented yet; the 'archive' option can be used to save multiple datestamped databases (which you can merge on your own if necessary)."
-                raise NotImplementedError(reason)
-        else:
-            dbname = ":memory:"
+            self.dbname = dbname + ".db"
 
+        # isolation_level=None: sqlite autocommits each statement unless we
+        # open a transaction ourselves (which flush() does)
         super().__init__(
-            dbname, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+            ":memory:",
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level=None,
+            # with a writer, the connection is handed between threads; execute()
+            # makes sure the two never use it at once
+            check_same_thread=not writer_queue,
         )
 
         self.row_factory = sqlite3.Row
+        self.create_function("inflate", 2, inflate, deterministic=True)
 
         self.execute("PRAGMA foreign_keys=ON;")
         self.execute(
@@ -54,14 +167,23 @@ class OurDb(sqlite3.Connection):
             );
         """
         )
+        # tracebacks and output are stored once per distinct text, by hash
+        self.execute(
+            """CREATE TABLE payloads(
+                hash TEXT NOT NULL PRIMARY KEY,
+                zlib INTEGER,
+                data BLOB
+            );
+        """
+        )
         self.execute(
             """CREATE TABLE exceptions(
                 id INTEGER NOT NULL PRIMARY KEY,
                 e_class TEXT,
                 e_context TEXT,
                 e_message TEXT,
-                e_traceback TEXT,
-                e_output TEXT,
+                e_traceback_hash TEXT REFERENCES payloads(hash),
+                e_output_hash TEXT REFERENCES payloads(hash),
                 e_line INTEGER,
                 e_path TEXT,
                 e_terminal INTEGER,
@@ -70,15 +192,301 @@ class OurDb(sqlite3.Connection):
             );
         """
         )
+        # --cover: the lines each node ran itself, as a bitmap per file
+        self.execute(
+            """CREATE TABLE files(
+                id INTEGER NOT NULL PRIMARY KEY,
+                path TEXT
+            );
+        """
+        )
+        self.execute(
+            """CREATE TABLE coverage(
+                id INTEGER NOT NULL PRIMARY KEY,
+                node_id INTEGER REFERENCES nodes(id),
+                file_id INTEGER REFERENCES files(id),
+                lines BLOB
+            );
+        """
+        )
+        self.execute(
+            """CREATE TABLE runs(
+                id INTEGER NOT NULL PRIMARY KEY,
+                started TEXT,
+                module TEXT,
+                earmarks TEXT,
+                host TEXT,
+                revision TEXT,
+                shard TEXT
+            );
+        """
+        )
+        # exceptions()/warnings() filter on ignore; tree reports join on node_id
+        self.execute("CREATE INDEX exceptions_node ON exceptions(node_id);")
+        self.execute("CREATE INDEX exceptions_ignore ON exceptions(ignore, node_id);")
+        self.execute("CREATE INDEX coverage_node ON coverage(node_id);")
+        self.add_run(options)
+        if self.tracking:
+            self.execute("ATTACH DATABASE ? AS track;", (self.dbname,))
+        if writer_queue:
+            self.writer = Writer(writer_queue)
+
+    def execute(self, *args):  # pylint: disable=arguments-differ
+        """Flush pending writes first, so that reads see a consistent database."""
+        # work queued to the writer runs in order, so it needn't wait on itself
+        if self.writer is None or threading.current_thread() is not self.writer:
+            self.flush()
+            if self.writer:
+                self.writer.wait()
+        return super().execute(*args)
+
+    def write(self, query, params):
+        """
+        Execute a write, or queue it if write buffering is on.
 
-    def add_exception(self, node, exception):
+        Queued writes are flushed with executemany inside a single transaction
+        when buffer_size rows are pending, when flush_interval seconds have
+        passed since the last flush, or before any read through execute().
+        """
+        if not self.buffer_size:
+            return super().execute(query, params)
+
+        self.pending.setdefault(query, []).append(params)
+        self.pending_rows += 1
+        if self.flush_due():
+            self.flush()
+        return None
+
+    def buffered(self):
+        """Return whether any writes are waiting to be applied."""
+        return bool(self.pending_rows)
+
+    def flush_due(self):
+        """Return whether buffered writes should be flushed now; see write()."""
+        return self.pending_rows >= self.buffer_size or (
+            self.flush_interval is not None
+            and time.monotonic() - self.flushed_at >= self.flush_interval
+        )
+
+    def flush(self):
+        if self.pending_rows:
+            if self.writer:
+                self.writer.put(functools.partial(self.commit, self.pending))
+            else:
+                self.commit(self.pending)
+        self.clear_pending()
+
+    def commit(self, pending):
+        """Apply a batch of queued writes inside one transaction."""
+        super().execute("BEGIN;")
+        try:
+            for query, rows in pending.items():
+                self.executemany(query, rows)
+        except BaseException:
+            super().execute("ROLLBACK;")
+            raise
+        super().execute("COMMIT;")
+
+    def clear_pending(self):
+        # dicts keep insertion order, so statements flush in the order they were
+        # first queued; seeding nouns, nodes and payloads ensures they land
+        # before the nodes, updates and exceptions that reference them.
+        self.pending = {
+            self.add_noun_sql: [],
+            self.add_node_sql: [],
+            self.add_payload_sql: [],
+            self.add_file_sql: [],
+        }
+        self.pending_rows = 0
+        self.flushed_at = time.monotonic()
+
+    def add_run(self, options):
+        options = options or {}
+        earmarks = options.get("earmarks")
         self.execute(
-            "INSERT INTO exceptions (e_class, e_message, e_traceback, e_output, e_line, e_path, e_context, e_terminal, node_id, ignore) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+            "INSERT INTO runs (id, started, module, earmarks, host, revision, shard) VALUES (1, ?, ?, ?, ?, ?, ?);",
+            (
+                datetime.datetime.utcnow().isoformat(),
+                options.get("module"),
+                str(earmarks) if earmarks is not None else None,
+                socket.gethostname(),
+                self.revision(),
+                "{}/{}".format(*options["shard"]) if options.get("shard") else None,
+            ),
+        )
+
+    @staticmethod
+    def revision():
+        """Return the git revision of the working directory, if there is one."""
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+                universal_newlines=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def columns(self, table, schema="main"):
+        return [
+            (row["name"], row["type"])
+            for row in self.execute("PRAGMA {}.table_info({});".format(schema, table))
+        ]
+
+    def setup_history_table(self, table):
+        """Create or extend track.<table> so it can hold every column of <table>."""
+        ours = self.columns(table)
+        theirs = {name for name, _ in self.columns(table, "track")}
+        if not theirs:
+            super().execute(
+                "CREATE TABLE track.{table}(run_id INTEGER NOT NULL REFERENCES runs(id), {columns}, PRIMARY KEY (run_id, id));".format(
+                    table=table,
+                    columns=", ".join(" ".join(column) for column in ours),
+                )
+            )
+        else:
+            # tracked stats can change between runs; add whatever's new
+            for column in ours:
+                if column[0] not in theirs:
+                    super().execute(
+                        "ALTER TABLE track.{} ADD COLUMN {} {};".format(table, *column)
+                    )
+
+    def setup_history(self):
+        super().execute(
+            """CREATE TABLE IF NOT EXISTS track.runs(
+                id INTEGER NOT NULL PRIMARY KEY,
+                started TEXT,
+                module TEXT,
+                earmarks TEXT,
+                host TEXT,
+                revision TEXT
+            );
+        """
+        )
+        theirs = {name for name, _ in self.columns("runs", "track")}
+        for column in self.columns("runs"):
+            if column[0] not in theirs:
+                super().execute("ALTER TABLE track.runs ADD COLUMN {} {};".format(*column))
+        super().execute(
+            """CREATE TABLE IF NOT EXISTS track.payloads(
+                hash TEXT NOT NULL PRIMARY KEY,
+                zlib INTEGER,
+                data BLOB
+            );
+        """
+        )
+        for table in ("nouns", "nodes", "exceptions", "files", "coverage"):
+            self.setup_history_table(table)
+        super().execute(
+            "CREATE INDEX IF NOT EXISTS track.nodes_key ON nodes(key, run_id);"
+        )
+        super().execute(
+            "CREATE INDEX IF NOT EXISTS track.nodes_parent ON nodes(run_id, parent_id);"
+        )
+        super().execute(
+            "CREATE INDEX IF NOT EXISTS track.exceptions_run ON exceptions(run_id, node_id);"
+        )
+
+    def persist_history(self):
+        """Copy this run into the attached history file, replacing any earlier checkpoint."""
+        super().execute("BEGIN;")
+        try:
+            self.setup_history()
+            if self.history_run_id is None:
+                self.history_run_id = super().execute(
+                    "INSERT INTO track.runs (started, module, earmarks, host, revision, shard) SELECT started, module, earmarks, host, revision, shard FROM main.runs;"
+                ).lastrowid
+            for table in ("coverage", "files", "exceptions", "nodes", "nouns"):
+                super().execute(
+                    "DELETE FROM track.{} WHERE run_id=?;".format(table),
+                    (self.history_run_id,),
+                )
+            # payloads are shared by every run that hit the same text
+            super().execute(
+                "INSERT OR IGNORE INTO track.payloads SELECT hash, zlib, data FROM main.payloads;"
+            )
+            for table in ("nouns", "nodes", "exceptions", "files", "coverage"):
+                columns = ", ".join(name for name, _ in self.columns(table))
+                super().execute(
+                    "INSERT INTO track.{table} (run_id, {columns}) SELECT ?, {columns} FROM main.{table};".format(
+                        table=table, columns=columns
+                    ),
+                    (self.history_run_id,),
+                )
+        except BaseException:
+            super().execute("ROLLBACK;")
+            raise
+        super().execute("COMMIT;")
+
+    def persist(self, final=False):
+        """
+        Write the in-memory database out to the save file in one pass.
+
+        The final write also runs ANALYZE, so saved databases come with the
+        statistics the query planner needs to pick our indexes. Checkpoints
+        are queued to the writer thread when there is one.
+        """
+        if self.dbname is None:
+            return
+        self.flush()
+        if self.writer:
+            self.writer.put(functools.partial(self.write_out, final))
+        else:
+            self.write_out(final)
+        self.checkpointed_at = time.monotonic()
+
+    def write_out(self, final=False):
+        if self.tracking:
+            self.persist_history()
+            if final:
+                super().execute("ANALYZE track;")
+            return
+        if final:
+            super().execute("ANALYZE;")
+        target = sqlite3.connect(self.dbname)
+        try:
+            self.backup(target)
+        finally:
+            target.close()
+
+    def checkpoint(self):
+        """Persist if checkpoint_interval seconds have passed since we last did."""
+        if (
+            self.checkpoint_interval is not None
+            and time.monotonic() - self.checkpointed_at >= self.checkpoint_interval
+        ):
+            self.persist()
+
+    def next_id(self, table):
+        self.last_id[table] += 1
+        return self.last_id[table]
+
+    def add_payload(self, text):
+        """Store <text> once, compressed if it's large, and return its hash."""
+        if text is None:
+            return None
+        data = text.encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest not in self.payloads:
+            self.payloads.add(digest)
+            compressed = len(data) >= self.compress_threshold
+            self.write(
+                self.add_payload_sql,
+                (digest, int(compressed), zlib.compress(data) if compressed else data),
+            )
+        return digest
+
+    def add_exception(self, node, exception):
+        self.write(
+            "INSERT INTO exceptions (e_class, e_message, e_traceback_hash, e_output_hash, e_line, e_path, e_context, e_terminal, node_id, ignore) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
             (
                 exception.__class__.__name__,
                 exception.message,
-                exception.traceback.strip(),
-                exception.output,
+                self.add_payload(exception.traceback.strip()),
+                self.add_payload(exception.output),
                 exception.line,
                 exception.path,
                 exception.context,
@@ -88,6 +496,17 @@ class OurDb(sqlite3.Connection):
             ),
         )
 
+    def add_coverage(self, node):
+        """Store the lines <node> ran itself (see anaphora.utils.Coverage), if any."""
+        for path, lines in (node.coverage.lines or {}).items():
+            file_id = self.files.get(path)
+            if file_id is None:
+                file_id = self.files[path] = self.next_id("files")
+                self.write(self.add_file_sql, (file_id, path))
+            self.write(
+                self.add_coverage_sql, (node.id, file_id, cover.bitmap(lines))
+            )
+
     def setup_stat_table(self, stats):
         # the comma in here is wrong if there are no tracked stats; either we need default tracking or that needs to be magicked
         # nodes table
@@ -97,14 +516,24 @@ class OurDb(sqlite3.Connection):
                 description TEXT,
                 parent_id INTEGER REFERENCES nodes(id),
                 noun_id INTEGER REFERENCES nouns(id),
+                depth INTEGER,
+                path TEXT,
+                key TEXT,
+                unit INTEGER,
                 {}
             );
         """.format(
                 ", ".join([stat.create_sql for stat in stats])
             )
         )
-        # aggregate table (mostly for joining on); this index is only valid for the child-most objects; it probably needs to be added to the existing aggregate!
-        # I think that caveat (it's only valid for the child-most objects!) is my problem
+        self.execute("CREATE INDEX IF NOT EXISTS nodes_parent ON nodes(parent_id);")
+        # subtree walks are path range scans; depth counts can use either
+        self.execute("CREATE INDEX IF NOT EXISTS nodes_path ON nodes(path, depth);")
+        self.execute("CREATE INDEX IF NOT EXISTS nodes_depth ON nodes(depth, path);")
+        # keys are stable across runs (see Noun.key_for), so runs join on them
+        self.execute("CREATE INDEX IF NOT EXISTS nodes_key ON nodes(key);")
+        # aggregate view; update_node computes child_* columns in python as
+        # nodes exit (see Stat.fold), so this is only kept for ad-hoc queries
         self.execute(
             """CREATE VIEW IF NOT EXISTS aggregate
                 AS SELECT parent_id,
@@ -115,13 +544,23 @@ class OurDb(sqlite3.Connection):
                 ", ".join([stat.sum_sql for stat in stats])
             )
         )
+        # record how each stat aggregates so tools like merge can recompute it
+        self.execute(
+            """CREATE TABLE IF NOT EXISTS stats(
+                name TEXT NOT NULL PRIMARY KEY,
+                type TEXT,
+                aggregator TEXT
+            );
+        """
+        )
+        self.executemany(
+            "INSERT OR REPLACE INTO stats (name, type, aggregator) VALUES (?, ?, ?);",
+            [(stat.name, stat.column_type, stat.aggregator) for stat in stats],
+        )
 
     def track_stats(self, stats):
         self.tracked_stats = stats
         self.setup_stat_table(stats)
-        # LATERDO: not 100% sure we'll use this yet, but this means we use a single database file for test runs over time.
-        # LATERDO: if they indicate they're saving this database when we're done, we'll create a metadata table for them containing information about the conditions under which the test was run and key specific test runs against it (versus a more naive version where we just save timestamped database files for each run)
-        # self.execute(create meta)
 
     def clean_up(self, node):
         for stat in self.tracked_stats:
@@ -131,32 +570,51 @@ class OurDb(sqlite3.Connection):
         # self.tracked_stats = None
         # del self.tracked_stats
         Stat.rapture()
+        if self.writer:
+            self.flush()
+            self.writer.stop()
+            self.writer = None
+        self.persist(final=True)
         self.close()  # pylint: disable=no-member
 
     def add_node(self, node):
         # this could fail, but we'll just let it raise for now
-        cur = self.execute(
-            "INSERT INTO nodes (description, parent_id, noun_id) VALUES (?, ?, ?);",
+        node_id = self.next_id("nodes")
+        parent = node.parent
+        self.write(
+            self.add_node_sql,
             (
+                node_id,
                 node.description,
-                node.parent.id if node.parent else None,
+                parent.id if parent else None,
                 node.__class__.id,
+                node.depth,
+                node.path_to(node_id),
+                node.key,
+                node.unit,
             ),
         )
-        return cur.lastrowid
+        return node_id
 
     def update_node(self, node):
-        self.execute(
-            "WITH ag AS (SELECT * FROM aggregate WHERE parent_id={nodeid}) UPDATE nodes SET {query} WHERE nodes.id={nodeid};".format(
-                query=", ".join((stat.update_sql for stat in self.tracked_stats)),
-                nodeid=node.id,
+        self.add_coverage(node)
+        params = []
+        for stat in self.tracked_stats:
+            value, child = stat.compute(node), stat.aggregate(node)
+            stat.fold(node, value, child)
+            params += [value, child]
+        self.write(
+            "UPDATE nodes SET {query} WHERE id=?;".format(
+                query=", ".join((stat.update_sql for stat in self.tracked_stats))
             ),
-            [stat.compute(node) for stat in self.tracked_stats],
+            params + [node.id],
         )
+        self.checkpoint()
 
     def add_noun(self, noun):
-        cur = self.execute("INSERT INTO nouns (name) VALUES (?);", (noun.__name__,))
-        return cur.lastrowid
+        noun_id = self.next_id("nouns")
+        self.write(self.add_noun_sql, (noun_id, noun.__name__))
+        return noun_id
 
 
 class QueryAPI(OurDb):
@@ -171,23 +629,50 @@ class QueryAPI(OurDb):
 
     # pylint: disable=no-member
 
+    @classmethod
+    def open(cls, path, mmap_size=1 << 30, cache_size=-1 << 16):
+        """
+        Return a read-only QueryAPI over the saved database at :path:.
+
+        The database is memory-mapped (up to :mmap_size: bytes) and given a
+        page cache of :cache_size: (sqlite's convention: negative values are
+        KiB), which suits the large sequential reads reporters make.
+        """
+        db = cls.__new__(cls)
+        sqlite3.Connection.__init__(
+            db,
+            "file:{}?mode=ro".format(urllib.parse.quote(path)),
+            uri=True,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level=None,
+        )
+        db.row_factory = sqlite3.Row
+        db.create_function("inflate", 2, inflate, deterministic=True)
+        db.execute("PRAGMA mmap_size={:d};".format(mmap_size))
+        db.execute("PRAGMA cache_size={:d};".format(cache_size))
+        db.execute("PRAGMA temp_store=MEMORY;")
+        return db
+
     # re-cycle common query parts
+    # every node stores its depth and a materialized path (see Noun.path),
+    # so a subtree is the range of paths starting with its root's path. "~"
+    # sorts after the hex digits and "." separators paths are made of.
     query_templates = {
         "tree": """
-            WITH RECURSIVE tree(id, depth) AS (
-                SELECT id,
-                        0 AS depth
-                FROM nodes
-                WHERE id={}
-                UNION ALL
-                SELECT child.id,
-                        parent.depth + 1
-                FROM nodes AS child
-                JOIN tree AS parent ON child.parent_id=parent.id
-                ORDER BY depth DESC, id ASC
-            )
+            WITH root AS (SELECT path, depth FROM nodes WHERE id={})
             {}
-        """
+        """,
+        "subtree": "JOIN nodes ON nodes.path >= root.path AND nodes.path < root.path || '~'",
+        # payloads are only inflated for rows the caller actually steps through
+        "exceptions": """
+            SELECT exceptions.*,
+                inflate(traceback.data, traceback.zlib) AS e_traceback,
+                inflate(output.data, output.zlib) AS e_output
+            FROM exceptions
+            LEFT OUTER JOIN payloads AS traceback ON traceback.hash=exceptions.e_traceback_hash
+            LEFT OUTER JOIN payloads AS output ON output.hash=exceptions.e_output_hash
+            {}
+        """,
     }
     # calculate the sql behind major queries and keep it here
     # both so we aren't calculating on call, and so other functions can use
@@ -195,59 +680,103 @@ class QueryAPI(OurDb):
     # ideally also need some modular notions like, "with exceptions" and possibly "with noun" that can just be tacked onto the right queries.
     queries = {
         # not sure the exception part of this query is needed? or could be bolt-on?
+        # only a node's first exception is joined, so each node appears once
         "tree": query_templates["tree"].format(
             1,
             """
-            SELECT tree.depth, nodes.*, nouns.name, exceptions.e_class, exceptions.e_message, exceptions.e_traceback, exceptions.e_line, exceptions.e_path
-            FROM tree
-            JOIN nodes ON tree.id=nodes.id
+            SELECT nodes.depth - root.depth AS depth, nodes.*, nouns.name, exceptions.e_class, exceptions.e_message, inflate(traceback.data, traceback.zlib) AS e_traceback, exceptions.e_line, exceptions.e_path
+            FROM root
+            {}
             JOIN nouns ON nodes.noun_id=nouns.id
-            LEFT OUTER JOIN exceptions ON exceptions.node_id=nodes.id
-            """,
+            LEFT OUTER JOIN exceptions ON exceptions.id=(
+                SELECT min(id) FROM exceptions WHERE node_id=nodes.id
+            )
+            LEFT OUTER JOIN payloads AS traceback ON traceback.hash=exceptions.e_traceback_hash
+            ORDER BY nodes.path
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
         "node_tree": query_templates["tree"].format(
             "?",
             """
-            SELECT tree.depth, nodes.*
-            FROM tree
-            JOIN nodes ON tree.id=nodes.id
-            """,
+            SELECT nodes.depth - root.depth AS depth, nodes.*
+            FROM root
+            {}
+            ORDER BY nodes.path
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
         "depths": query_templates["tree"].format(
             1,
             """
-            SELECT DISTINCT depth, count(depth) as count
-            FROM tree
-            GROUP BY depth
-            """,
+            SELECT nodes.depth - root.depth AS depth, count(*) as count
+            FROM root
+            {}
+            GROUP BY nodes.depth
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
         "depth": query_templates["tree"].format(
             1,
             """
-            SELECT DISTINCT depth, count(depth) as count
-            FROM tree
-            WHERE depth=?
-            GROUP BY depth
-            """,
+            SELECT nodes.depth - root.depth AS depth, count(*) as count
+            FROM root
+            {}
+            WHERE nodes.depth=root.depth + ?
+            GROUP BY nodes.depth
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
         "node_depths": query_templates["tree"].format(
             "?",
             """
-            SELECT DISTINCT depth, count(depth) as count
-            FROM tree
-            GROUP BY depth
-            """,
+            SELECT nodes.depth - root.depth AS depth, count(*) as count
+            FROM root
+            {}
+            GROUP BY nodes.depth
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
         "node_depth": query_templates["tree"].format(
             "?",
             """
-            SELECT DISTINCT depth, count(depth) as count
-            FROM tree
-            WHERE depth=?
-            GROUP BY depth
-            """,
+            SELECT nodes.depth - root.depth AS depth, count(*) as count
+            FROM root
+            {}
+            WHERE nodes.depth=root.depth + ?
+            GROUP BY nodes.depth
+            """.format(
+                query_templates["subtree"]
+            ),
         ),
     }
+    queries["coverage"] = query_templates["tree"].format(
+        "?",
+        """
+        SELECT files.path, coverage.lines
+        FROM root
+        {}
+        JOIN coverage ON coverage.node_id=nodes.id
+        JOIN files ON files.id=coverage.file_id
+        """.format(
+            query_templates["subtree"]
+        ),
+    )
+    queries["all_exceptions"] = query_templates["exceptions"].format("")
+    queries["ignored_exceptions"] = query_templates["exceptions"].format(
+        "WHERE exceptions.ignore == 1"
+    )
+    queries["exceptions"] = query_templates["exceptions"].format(
+        "WHERE exceptions.ignore == 0"
+    )
+    queries["warnings"] = query_templates["exceptions"].format(
+        "WHERE exceptions.ignore == 2"
+    )
 
     def tree(self, node_id=None):
         """
@@ -295,6 +824,88 @@ class QueryAPI(OurDb):
             else self.execute(self.queries["depth"], (depth,)).fetchone()
         )
 
+    @property
+    def history_schema(self):
+        """Schema holding run history: the attached file when tracking, else this db."""
+        return "track" if self.tracking else "main"
+
+    def runs(self):
+        """
+        Return iterator over runs recorded in the history database.
+        """
+        return self.execute(
+            "SELECT * FROM {}.runs ORDER BY id ASC;".format(self.history_schema)
+        )
+
+    def history(self, key, stat="during"):
+        """
+        Return iterator over one node's :stat: across runs, oldest first.
+
+        Nodes are matched on their stable :key: (see Noun.key_for). Each row
+        has the run's id and start time alongside a "value" key holding the
+        stat.
+        """
+        schema = self.history_schema
+        if stat not in {name for name, _ in self.columns("nodes", schema)}:
+            raise KeyError("no such stat in history: {}".format(stat))
+        return self.execute(
+            """SELECT runs.id AS run_id, runs.started, nodes.id, nodes.{stat} AS value
+            FROM {schema}.nodes AS nodes
+            JOIN {schema}.runs AS runs ON nodes.run_id=runs.id
+            WHERE nodes.key=?
+            ORDER BY nodes.run_id ASC;""".format(
+                stat=stat, schema=schema
+            ),
+            (key,),
+        )
+
+    def failures(self):
+        """
+        Return the keys of nodes with unignored exceptions, and of their ancestors.
+
+        Both are sets. Track databases report on their most recent run.
+        """
+        names = {name for name, _ in self.columns("nodes")}
+        run = "AND {table}.run_id=(SELECT max(id) FROM runs)" if "run_id" in names else ""
+        failed = self.execute(
+            """SELECT DISTINCT nodes.key, nodes.path FROM exceptions
+            JOIN nodes ON nodes.id=exceptions.node_id {}
+            WHERE exceptions.ignore=0 {};""".format(
+                "AND nodes.run_id=exceptions.run_id" if run else "",
+                run.format(table="exceptions"),
+            )
+        ).fetchall()
+        # every proper prefix of a failed node's path is an ancestor's path
+        prefixes = {
+            row["path"][: index + 1]
+            for row in failed
+            for index, char in enumerate(row["path"][:-1])
+            if char == "."
+        }
+        ancestors = {
+            row["key"]
+            for row in self.execute(
+                "SELECT key FROM nodes WHERE path IN (SELECT value FROM json_each(?)) {};".format(
+                    run.format(table="nodes")
+                ),
+                (json.dumps(sorted(prefixes)),),
+            )
+        }
+        return {row["key"] for row in failed}, ancestors
+
+    def coverage(self, node_id=None):
+        """
+        Return {path: sorted line numbers} run under --cover by a node and its descendants.
+
+        Covers the whole run by default.
+        """
+        covered = {}
+        for row in self.execute(self.queries["coverage"], (node_id or 1,)):
+            covered[row["path"]] = covered.get(row["path"], 0) | int.from_bytes(
+                row["lines"], "little"
+            )
+        return {path: cover.lines(value) for path, value in covered.items()}
+
     # def nouns(self):
     #   return
 
@@ -306,26 +917,26 @@ class QueryAPI(OurDb):
         return (
             self.execute("SELECT count(*) FROM exceptions;")
             if count
-            else self.execute("SELECT * FROM exceptions;")
+            else self.execute(self.queries["all_exceptions"])
         )
 
     def ignored_exceptions(self, count=False):
         return (
             self.execute("SELECT count(*) FROM exceptions WHERE ignore == 1;")
             if count
-            else self.execute("SELECT * FROM exceptions WHERE ignore == 1;")
+            else self.execute(self.queries["ignored_exceptions"])
         )
 
     def exceptions(self, count=False):
         return (
             self.execute("SELECT count(*) FROM exceptions WHERE ignore == 0;")
             if count
-            else self.execute("SELECT * FROM exceptions WHERE ignore == 0;")
+            else self.execute(self.queries["exceptions"])
         )
 
     def warnings(self, count=False):
         return (
             self.execute("SELECT count(*) FROM exceptions WHERE ignore == 2;")
             if count
-            else self.execute("SELECT * FROM exceptions WHERE ignore == 2;")
+            else self.execute(self.queries["warnings"])
         )
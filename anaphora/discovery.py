@@ -0,0 +1,224 @@
+"""List a module's test functions, classes, methods and imports without importing it."""
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+
+class Member(object):
+
+    """
+    A module member we know of from the index but haven't imported yet.
+
+    convert() resolves these only after the selector's predicate has passed
+    them, so a module is imported only once something in it will run.
+    """
+
+    def __init__(self, module, *names):
+        self.module = module
+        self.names = names
+
+    def resolve(self):
+        obj = self.module.test  # imports on first use
+        for name in self.names:
+            obj = getattr(obj, name)
+        return obj
+
+
+def resolve(obj):
+    return obj.resolve() if isinstance(obj, Member) else obj
+
+
+def imports(tree):
+    """
+    Return the modules an AST may import, relative ones with their leading dots.
+
+    "from a import b" yields both a and a.b, since b may be a submodule;
+    names that turn out not to be modules are dropped when resolved.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            if node.module:
+                names.add(base)
+            names.update(
+                base + ("" if base.endswith(".") else ".") + alias.name
+                for alias in node.names
+                if alias.name != "*"
+            )
+    return sorted(names)
+
+
+def summarize(source):
+    """
+    Return the top-level functions and classes and the imports in <source>.
+
+    Methods aren't listed: a Class runner instantiates its class, so the
+    module is imported by the time they're selected.
+    """
+    functions, classes = [], []
+    tree = ast.parse(source)
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            classes.append(node.name)
+    return {"functions": sorted(functions), "classes": sorted(classes), "imports": imports(tree)}
+
+
+class Index(object):
+
+    """
+    An on-disk cache of summarize() results, keyed on each file's path.
+
+    An entry is reused while the file's mtime is unchanged, or its contents
+    still hash the same (e.g. after a checkout touched it). Otherwise the
+    file is parsed again. Entries are written back by save(), once at the
+    end of a run, and only if any changed.
+    """
+
+    path = ".anaphora-index.json"
+    changed = False
+
+    def __init__(self, path=None):
+        if path is not None:
+            self.path = path
+        try:
+            with open(self.path, "r") as index:
+                self.entries = json.load(index)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        if not self.changed:
+            return
+        temp = self.path + ".tmp"
+        with open(temp, "w") as index:
+            json.dump(self.entries, index)
+        os.replace(temp, self.path)
+        self.changed = False
+
+    @staticmethod
+    def locate(module_str):
+        """Return the source file for <module_str> (importing only its parent packages)."""
+        spec = importlib.util.find_spec(module_str)
+        if spec is None or not spec.has_location or not spec.origin.endswith(".py"):
+            return None
+        return spec.origin
+
+    def entry(self, filename):
+        mtime = os.stat(filename).st_mtime_ns
+        entry = self.entries.get(filename)
+        if entry is not None and (
+            "imports" not in entry or isinstance(entry["classes"], dict)
+        ):
+            entry = None  # indexed before we kept imports, or with methods
+        if entry is not None and entry["mtime"] == mtime:
+            return entry
+        with open(filename, "rb") as source:
+            source = source.read()
+        digest = hashlib.blake2b(source, digest_size=16).hexdigest()
+        if entry is None or entry["hash"] != digest:
+            entry = dict(summarize(source), hash=digest)
+        entry["mtime"] = mtime
+        self.entries[filename] = entry
+        self.changed = True
+        return entry
+
+    def summary(self, module_str):
+        """Return <module_str>'s functions and classes, or None if it has no source."""
+        filename = self.locate(module_str)
+        return None if filename is None else self.entry(filename)
+
+    def functions(self, module_str):
+        return self.summary(module_str)["functions"]
+
+    def classes(self, module_str):
+        return self.summary(module_str)["classes"]
+
+
+def find(module_str):
+    """Return the source file sys.path would import <module_str> from, without importing."""
+    parts = module_str.split(".")
+    for entry in sys.path:
+        base = os.path.join(entry or os.getcwd(), *parts)
+        for filename in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(filename):
+                return os.path.abspath(filename)
+    return None
+
+
+def absolute(name, package):
+    """Return the module a (possibly relative) import of <name> in <package> names."""
+    if not name.startswith("."):
+        return name
+    level = len(name) - len(name.lstrip("."))
+    parts = package.split(".")[: len(package.split(".")) - level + 1]
+    return ".".join(part for part in parts + [name[level:]] if part)
+
+
+def changed_since(ref):
+    """Return files under the working directory changed since git <ref>, or untracked."""
+    changed = []
+    for command in (
+        ["git", "diff", "--name-only", "--relative", ref],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ):
+        changed += subprocess.run(
+            command, stdout=subprocess.PIPE, check=True, universal_newlines=True
+        ).stdout.splitlines()
+    return changed
+
+
+class Impact(object):
+
+    """
+    Which modules a set of changed files can affect, from the static import graph.
+
+    A module is affected if it, one of its packages, or anything it imports
+    (transitively) is a changed file. Only files under <root> (the working
+    directory by default) are followed; the rest are assumed unchanged.
+    Each file's imports come from <index>, so they're only parsed again
+    when the file changes.
+    """
+
+    def __init__(self, changed, index, root=None):
+        self.changed = {os.path.abspath(filename) for filename in changed}
+        self.index = index
+        self.root = os.path.abspath(root or os.getcwd()) + os.sep
+        self.loads = {}  # module_str: files importing it loads
+
+    def files(self, module_str):
+        """Return the files under root that importing <module_str> loads."""
+        if module_str not in self.loads:
+            files, seen, pending = set(), set(), [module_str]
+            while pending:
+                name = pending.pop()
+                if name in seen:
+                    continue
+                seen.add(name)
+                parts = name.split(".")
+                # importing a.b.c runs a and a.b first
+                pending += [".".join(parts[:end]) for end in range(1, len(parts))]
+                filename = find(name)
+                if filename is None or not filename.startswith(self.root):
+                    continue
+                files.add(filename)
+                package = name if filename.endswith("__init__.py") else name.rpartition(".")[0]
+                pending += [
+                    absolute(imported, package)
+                    for imported in self.index.entry(filename)["imports"]
+                ]
+            self.loads[module_str] = files
+        return self.loads[module_str]
+
+    def affected(self, module_str):
+        if find(module_str) is None:
+            return True  # we can't see what it imports, so it has to run
+        return bool(self.files(module_str) & self.changed)
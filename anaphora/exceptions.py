@@ -1,3 +1,4 @@
+import os
 import traceback
 
 
@@ -133,6 +134,14 @@ class TestRunException(AnaphoraException):
         self.initialize()
         return self
 
+    def with_remote_cause(self, cause):
+        """Like with_cause, for a cause raised in another process (see parallel)."""
+        self.initialized = True
+        self._lineno = cause.line
+        self._path = cause.path
+        self._traceback += cause.traceback
+        return self
+
     def __str__(self):
         return self.message
 
@@ -157,6 +166,11 @@ class AfterHookError(HookError):
     _problem = "broken after hook"
 
 
+# 'FixtureError: {node} has broken fixture at {filename}:{line}:'
+class FixtureError(HookError):
+    _problem = "broken fixture"
+
+
 # 'TestError: {node} has broken test body at {filename}:{line}:'
 class TestError(TestRunException):
     CRITICAL = True
@@ -168,6 +182,31 @@ class SkipNode(TestRunException):
     _problem = "was skipped"
 
 
+# 'NodeTimeout: {node} has exceeded its 5s budget at {filename}:{line}:'
+class NodeTimeout(TestRunException):
+
+    """Raised by the watchdog in whatever test code was running when a budget ran out."""
+
+    @property
+    def problem(self):
+        return "exceeded its {}s budget".format(self.node.budget)
+
+    def initialize(self):
+        self.initialized = True
+        # blame the innermost frame that isn't anaphora's (the watchdog's, say)
+        here = os.path.dirname(__file__)
+        stack = [
+            summary
+            for summary in traceback.extract_tb(self.__traceback__)
+            if os.path.dirname(summary.filename) != here
+        ]
+        if stack:
+            self._lineno = stack[-1].lineno
+            self._path = stack[-1].filename
+            self._traceback += ["Traceback (most recent call last):\n"]
+            self._traceback += traceback.format_list(stack[-1:])
+
+
 # LATERDO:
 # * reporters should be able to handle most of the formatting for these (i.e., the fake reporter below needs to fall so tightly in line with real exceptions that it's plausible for them to do so.) The best version of this will require giving the reporter a swing at formatting every exception if it declares some function?
 # * evaluate whether informally calling this "TestFailure" is going to cause problems (i.e., do I need to lie when I insert it into the db, as well?)
@@ -185,10 +224,19 @@ class CommandFailure(TestFailure):
 
     @property
     def problem(self):
+        if self.node.timed_out:
+            return 'timeout after {node.timeout}s for "{node.test}"'.format(
+                node=self.node
+            )
         return 'exit status {exit_status} for "{node.test}"'.format(
             node=self.node, exit_status=self.exit_status
         )
 
+    @property
+    def spool(self):
+        """Path to the command's full output, if it was too long to keep in memory."""
+        return self.node.spool.path if self.node.spool else None
+
     @property
     def issue(self):
         return "{problem} in {node.parent} at {location}".format(
@@ -0,0 +1,64 @@
+"""Declare values that are built once per scope and shared by the nodes in it."""
+import inspect
+
+SCOPES = ("run", "module", "class", "subtree")
+
+
+class Fixture(object):
+
+    """
+    A value built on first use and shared until the node owning its scope exits.
+
+    <setup> returns the value, or is a generator function that yields it
+    once and tears it down after the yield. Which node owns (caches and
+    tears down) the value for a node that uses it depends on <scope>:
+
+    - run: the root node
+    - module: the nearest enclosing Module runner, else the root
+    - class: the nearest enclosing Class runner, else as for module
+    - subtree: the nearest enclosing node that provide()s it, else the user
+
+    Owners record the time spent setting up and tearing down their
+    fixtures in the "setup" and "teardown" stats.
+    """
+
+    def __init__(self, setup, scope="subtree"):
+        if scope not in SCOPES:
+            raise ValueError(
+                "fixture scope must be one of {}, not {!r}".format(", ".join(SCOPES), scope)
+            )
+        self.setup = setup
+        self.scope = scope
+        self.name = setup.__name__
+
+    def build(self, runtime):
+        """Return (value, teardown generator or None), adding the time to runtime["setup"]."""
+        runtime.start("setup")
+        try:
+            if inspect.isgeneratorfunction(self.setup):
+                teardown = self.setup()
+                return next(teardown), teardown
+            return self.setup(), None
+        finally:
+            runtime["setup"] += runtime.stop("setup")
+
+    def finish(self, teardown, runtime):
+        """Run the rest of <teardown>, adding the time to runtime["teardown"]."""
+        runtime.start("teardown")
+        try:
+            for _ in teardown:
+                raise RuntimeError("fixture {} yielded more than once".format(self.name))
+        finally:
+            runtime["teardown"] += runtime.stop("teardown")
+
+    def __repr__(self):
+        return "Fixture({}, scope={!r})".format(self.name, self.scope)
+
+
+def fixture(scope="subtree"):
+    """Declare the decorated function a Fixture with <scope>."""
+
+    def declare(setup):
+        return Fixture(setup, scope)
+
+    return declare
@@ -0,0 +1,172 @@
+"""Combine results databases from separate processes or machines into one."""
+import argparse
+import os
+import sqlite3
+
+from .stats import Stat
+
+ROOT_PATH = "{:08x}.".format(1)
+
+
+def repath(path, offset):
+    """Return a materialized path with every id in it shifted by <offset>."""
+    return "".join(
+        "{:08x}.".format(int(segment, 16) + offset) for segment in path.split(".")[:-1]
+    )
+
+
+class Merge(sqlite3.Connection):
+
+    """
+    A results database built by streaming other results databases into it.
+
+    Each input is attached in turn and copied with INSERT ... SELECT, so rows
+    never pass through python. Node and noun ids are offset past the ones
+    already merged, and each input's root is grafted under a synthetic root
+    (node 1). Once every input is in, the child_* columns are recomputed
+    level by level from the stats table.
+    """
+
+    def __init__(self, target, description="MergedRun"):
+        if os.path.exists(target):
+            raise FileExistsError(target)
+        super().__init__(target, isolation_level=None)
+        self.row_factory = sqlite3.Row
+        self.create_function("repath", 2, repath, deterministic=True)
+        self.description = description
+        self.merged = 0
+
+    def columns(self, table, schema="main"):
+        return [
+            row["name"]
+            for row in self.execute("PRAGMA {}.table_info({});".format(schema, table))
+        ]
+
+    def setup(self):
+        """Copy the first input's schema and add the synthetic root."""
+        for row in self.execute(
+            "SELECT type, sql FROM src.sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type='table' DESC, type='index' DESC;"
+        ).fetchall():
+            self.execute(row["sql"])
+        self.execute("INSERT INTO nouns (id, name) VALUES (1, ?);", (self.description,))
+        self.execute(
+            "INSERT INTO nodes (id, description, parent_id, noun_id, depth, path) VALUES (1, ?, NULL, 1, 0, ?);",
+            (self.description, ROOT_PATH),
+        )
+        self.execute("INSERT INTO stats SELECT * FROM src.stats;")
+
+    def copy(self, table, expressions):
+        """INSERT ... SELECT the columns <table> has in both dbs, some rewritten."""
+        ours = self.columns(table)
+        if "run_id" in self.columns(table, "src"):
+            raise ValueError("merging track history databases isn't supported")
+        columns = [
+            column
+            for column in self.columns(table, "src")
+            if column in ours and expressions.get(column, column)
+        ]
+        self.execute(
+            "INSERT INTO main.{table} ({columns}) SELECT {values} FROM src.{table} ORDER BY id;".format(
+                table=table,
+                columns=", ".join(columns),
+                values=", ".join(expressions.get(column, column) for column in columns),
+            )
+        )
+
+    def add(self, source):
+        """Stream one results database into this one."""
+        if not os.path.exists(source):
+            raise FileNotFoundError(source)  # ATTACH would create an empty db
+        self.execute("ATTACH DATABASE ? AS src;", (source,))
+        try:
+            self.execute("BEGIN;")
+            if not self.merged:
+                self.setup()
+            nodes = self.execute("SELECT max(id) FROM main.nodes;").fetchone()[0]
+            nouns = self.execute("SELECT max(id) FROM main.nouns;").fetchone()[0]
+            self.copy("nouns", {"id": "id + {}".format(nouns)})
+            self.execute("INSERT OR IGNORE INTO main.payloads SELECT * FROM src.payloads;")
+            self.copy(
+                "nodes",
+                {
+                    "id": "id + {}".format(nodes),
+                    "parent_id": "coalesce(parent_id + {}, 1)".format(nodes),
+                    "noun_id": "noun_id + {}".format(nouns),
+                    "depth": "depth + 1",
+                    "path": "'{}' || repath(path, {})".format(ROOT_PATH, nodes),
+                },
+            )
+            self.copy("exceptions", {"id": None, "node_id": "node_id + {}".format(nodes)})
+            if self.columns("files") and self.columns("files", "src"):  # --cover
+                files = self.execute("SELECT coalesce(max(id), 0) FROM main.files;").fetchone()[0]
+                self.copy("files", {"id": "id + {}".format(files)})
+                self.copy(
+                    "coverage",
+                    {
+                        "id": None,
+                        "node_id": "node_id + {}".format(nodes),
+                        "file_id": "file_id + {}".format(files),
+                    },
+                )
+            self.copy("runs", {"id": None})
+            self.execute("COMMIT;")
+        except BaseException:
+            if self.in_transaction:
+                self.execute("ROLLBACK;")
+            raise
+        finally:
+            self.execute("DETACH DATABASE src;")
+        self.merged += 1
+
+    def aggregate(self):
+        """Recompute every child_* column, deepest parents first."""
+        stats = self.execute("SELECT name, aggregator FROM stats;").fetchall()
+        if not stats:
+            return
+        deepest = self.execute("SELECT max(depth) FROM nodes;").fetchone()[0] or 0
+        # correlated subqueries rather than UPDATE ... FROM, which needs sqlite 3.33;
+        # unqualified columns in them resolve to the children
+        updates = ", ".join(
+            "child_{name}=(SELECT {aggregate} FROM nodes AS children WHERE children.parent_id=nodes.id)".format(
+                name=stat["name"],
+                aggregate=Stat.aggregate_sql(stat["name"], stat["aggregator"]),
+            )
+            for stat in stats
+        )
+        self.execute("BEGIN;")
+        for depth in range(deepest - 1, -1, -1):
+            self.execute(
+                """UPDATE nodes SET {updates}
+                WHERE depth=? AND id IN (SELECT parent_id FROM nodes);""".format(
+                    updates=updates
+                ),
+                (depth,),
+            )
+        self.execute("COMMIT;")
+
+    def finish(self):
+        self.aggregate()
+        self.execute("ANALYZE;")
+        self.close()
+
+
+def merge(target, sources, description="MergedRun"):
+    """Merge the results databases at <sources> into a new database at <target>."""
+    merged = Merge(target, description)
+    for source in sources:
+        merged.add(source)
+    merged.finish()
+
+
+def main():
+    """Merge results databases from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Merge anaphora results databases into a new one."
+    )
+    parser.add_argument("target", help="database to create")
+    parser.add_argument("sources", nargs="+", help="results databases to merge")
+    parser.add_argument(
+        "-d", "--description", default="MergedRun", help="description of the new root"
+    )
+    args = parser.parse_args()
+    merge(args.target, args.sources, args.description)
@@ -0,0 +1,183 @@
+"""Run runners in a pool of workers and replay their outcomes in the parent."""
+import concurrent.futures
+import io
+import pickle
+import sys
+import time
+import traceback
+
+import anaphora.utils
+
+
+class RemoteCause(object):
+
+    """
+    The parts of an exception a TestRunException needs, minus the traceback object.
+
+    Tracebacks don't pickle, so workers send the same formatted lines, path
+    and line number that TestRunException.initialize would have pulled from
+    the cause.
+    """
+
+    failed = False
+    traceback = path = line = None
+
+    def __init__(self, exc):
+        self.failed = isinstance(exc, AssertionError)
+        stack = traceback.format_exception(exc.__class__, exc, exc.__traceback__)
+        self.traceback = [stack[0]] + stack[-2:]
+        trace = exc.__traceback__
+        while trace.tb_next:
+            trace = trace.tb_next
+        self.line = trace.tb_lineno
+        self.path = trace.tb_frame.f_code.co_filename
+
+
+class Result(object):
+    value = duration = output = cause = None
+
+    def __init__(self, value, duration, output, cause):
+        self.value = value
+        self.duration = duration
+        self.output = output
+        self.cause = cause
+
+
+def execute(test):
+    """Call <test> in a worker, capturing what a runner would have recorded."""
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    value = cause = None
+    started = time.perf_counter()
+    try:
+        value = test()
+    except Exception as exc:  # pylint: disable=broad-except
+        cause = RemoteCause(exc)
+    finally:
+        duration = time.perf_counter() - started
+        output, sys.stdout = sys.stdout.getvalue(), stdout
+    try:
+        pickle.dumps(value)
+    except Exception:  # pylint: disable=broad-except
+        value = None  # the test ran fine; we just can't hand its value back
+    return Result(value, duration, output, cause)
+
+
+def shell(command, timeout=None, limit=1 << 20):
+    """Spawn <command> in a worker thread, timing it the way a runner would."""
+    started = time.perf_counter()
+    value = anaphora.utils.spawn(command, timeout, limit)
+    return Result(value, time.perf_counter() - started, None, None)
+
+
+def picklable(test):
+    try:
+        pickle.dumps(test)
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return True
+
+
+def submittable(runner, check=picklable):
+    """Return whether <runner> should run in a pool; see submit()."""
+    return (
+        getattr(runner, "parallelizable", False)
+        and runner.in_shard()
+        and (check is None or check(runner.test))
+        and not runner.uses
+        and not runner.cache_hit()
+    )
+
+
+def submit(runners, pool, check=picklable):
+    """
+    Yield <runners> after submitting every one we can to <pool>.
+
+    Runners keep their place in the sequence, so nodes are created, run and
+    recorded in the parent in the same order as a serial run; each one's
+    run() just waits for its outcome instead of calling the test. Runners
+    whose tests fail <check> (e.g. lambdas can't be pickled for a process
+    pool) run serially, as do runners using fixtures (their values live in
+    the parent), and runners with a cached result aren't submitted.
+    Nothing is pulled from <runners> until the first one is asked for.
+    """
+    runners = list(runners)
+    for runner in runners:
+        if submittable(runner, check):
+            runner.outcome = runner.submit(pool)
+    yield from runners
+
+
+class Lookahead(object):
+
+    """
+    Feed one pool from a sequence of collections, listing upcoming ones early.
+
+    When a collection starts, its runners are listed and submitted as in
+    submit(), and then so are the runners of the collections after it, until
+    <window> listed runners are waiting, so the pool doesn't idle between
+    small collections. Runners listed early are still constructed as their
+    own collection's children and only yielded (and run) from inside it, so
+    nodes are recorded just as in a serial run. Collections that won't be
+    iterated (see RunnerMixin.iterates) aren't listed early.
+    """
+
+    def __init__(self, pool, window, check=picklable):
+        self.pool = pool
+        self.window = window
+        self.check = check
+        self.sources = []  # (collection, its runners)
+        self.listed = {}  # index in sources: runners listed, not yet yielded
+        self.upcoming = 0  # index of the first source not listed yet
+        self.waiting = 0  # runners listed and not yet yielded
+
+    def add(self, source, runners):
+        """Return what <source> should yield in place of <runners>."""
+        self.sources.append((source, runners))
+        return self.runners(len(self.sources) - 1)
+
+    def runners(self, index):
+        if index >= self.upcoming:  # not listed ahead (skipped ones never will be)
+            self.upcoming = index
+            self.take(index)
+        for runner in self.listed.pop(index):
+            self.waiting -= 1
+            self.ahead()
+            yield runner
+
+    def ahead(self):
+        while self.waiting < self.window and self.upcoming < len(self.sources):
+            if self.sources[self.upcoming][0].iterates():
+                self.take(self.upcoming, early=True)
+            else:
+                self.upcoming += 1
+
+    def take(self, index, early=False):
+        """List and submit source <index>'s runners, as its children even if <early>."""
+        source, runners = self.sources[index]
+        if early:
+            source.follow_unit()  # what before_run would; our runners' shards need it
+            source.add()  # so the runners we construct take it as their parent
+        try:
+            runners = list(runners)
+        finally:
+            if early:
+                source.remove()
+        for runner in runners:
+            if submittable(runner, self.check):
+                runner.outcome = runner.submit(self.pool)
+        self.listed[index] = runners
+        self.waiting += len(runners)
+        self.upcoming = index + 1
+
+
+def pooled(runners, pool):
+    """Yield <runners>, shutting <pool> down once they're done with."""
+    try:
+        yield from runners
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def dispatch(runners, pool, check=picklable):
+    """submit() <runners> to <pool>, shutting it down once they're done with."""
+    return pooled(submit(runners, pool, check), pool)
@@ -70,11 +70,26 @@ class Reporter(object):
             warnings = node.db.warnings(count=True)
         if runtime is None:
             runtime = node.db.execute("SELECT during FROM nodes where id=1;").fetchone()
-        return "Anaphora run {:} in {:,.4f}s with {:} unignored exceptions{:}.".format(
+        shard = node.options.get("shard") if node.options else None
+        return "Anaphora run {:} in {:,.4f}s with {:} unignored exceptions{:}{:}{:}{:}{:}.".format(
             "failed" if exceptions else "passed",
             runtime,
             exceptions,
             " and {:} warnings".format(warnings) if warnings else "",
+            " (shard {:}/{:})".format(*shard) if shard else "",
+            "; stopped early" if node.stopped else "",
+            "; skipped {:} module{:} unaffected by changes".format(
+                node.unaffected, "" if node.unaffected == 1 else "s"
+            )
+            if node.unaffected
+            else "",
+            "; {:} cached result{:} used, {:} missed".format(
+                node.cache_counts["hit"],
+                "" if node.cache_counts["hit"] == 1 else "s",
+                node.cache_counts["miss"],
+            )
+            if node.cache_counts
+            else "",
         )
 
     @staticmethod
@@ -186,9 +201,18 @@ class Tree(Reporter):
             .called("during")
             .type("numeric")
             .aggregate_children(),
+            # time owners of fixtures spent building and tearing them down
+            Stat(lambda _: _.runtime["setup"].total_seconds())
+            .called("setup")
+            .type("numeric"),
+            Stat(lambda _: _.runtime["teardown"].total_seconds())
+            .called("teardown")
+            .type("numeric"),
             # base test stats
             Stat(lambda _: _.succeeded).called("succeeded").type("integer"),
             Stat(lambda _: _.ignored).called("ignore").type("integer"),
+            # seconds the original run of a cached result took; see TestRunner.cached
+            Stat(lambda _: _.cached_duration).called("cached").type("numeric"),
             # composite test stats
         )
 
@@ -1,10 +1,25 @@
+import collections
+import concurrent.futures
+import functools
+import glob
+import hashlib
 import inspect
+import marshal
+import os
 import subprocess
 import itertools
+import pickle
+import sqlite3
 import sys
+import time
 
 
 from anaphora import meta, exceptions
+import anaphora.cache
+import anaphora.cover
+import anaphora.discovery
+import anaphora.parallel
+import anaphora.sharding
 import anaphora.utils
 from anaphora.stats import Stat
 import anaphora.db
@@ -15,12 +30,14 @@ def convert(converter):
 
     def matching(func):
         def match(self, predicate=None):
-            if predicate:
-                self.les_iterables = (
-                    converter(obj) for key, obj in func(self) if predicate(key)
-                )
-            else:
-                self.les_iterables = (converter(obj) for key, obj in func(self))
+            def members():
+                # listed once we're iterated, so skipped modules aren't imported;
+                # objects may be discovery Members, which import when resolved
+                for key, obj in func(self):
+                    if not predicate or predicate(key):
+                        yield converter(anaphora.discovery.resolve(obj))
+
+            self.les_iterables = self.failed_first(members())
             return self
 
         return match
@@ -42,9 +59,12 @@ class RunnerMixin(object):
     _modules = None
     _test = None
     les_iterables = None
+    sources = ()  # the collections chained into les_iterables; see chain()
+    transforms = ()  # what each() has applied to what they yield since
 
     def load(self, module_strs):
         self._modules = module_strs
+        self.sources = ()
         self.les_iterables = map(Module, module_strs)
         self.before_run()
         return self
@@ -55,7 +75,10 @@ class RunnerMixin(object):
 
     def __next__(self):
         try:
-            return next(self.les_iterables)
+            item = next(self.les_iterables)
+            while not item.in_shard():
+                item = next(self.les_iterables)
+            return item
         except StopIteration:
             self.after_run()
             raise
@@ -73,51 +96,123 @@ class RunnerMixin(object):
     def before_run(self):
         if self.before_ran:
             return
-        if not self.id:
-            self.__class__.id = self.db.add_noun(self.__class__)
-        self.id = self.db.add_node(self)  # pylint: disable=invalid-name
-        self.add()
+        with self.watchdog.hold():
+            self.follow_unit()
+            if not self.rerunning:  # ...and whether their parent is being rerun
+                self.rerun()
+            if not self.id:
+                self.__class__.id = self.db.add_noun(self.__class__)
+            self.id = self.db.add_node(self)  # pylint: disable=invalid-name
+            self.add()
+            self.start_budget()
+
+            self.coverage.start()
+            self.run_hooks(self.hooks.BEFORE)
+            self.before_ran = True
+
+    def follow_unit(self):
+        """Collections follow their parent's shard; see in_shard."""
+        if not self.unit:
+            self.in_unit = self.parent is not None and self.parent.in_unit
+
+    def iterates(self):
+        """Return whether iterating us yields what les_iterables does."""
+        return True
 
-        self.coverage.start()
-        self.hooks.run(self.hooks.BEFORE)
-        self.before_ran = True
+    def after_run(self, skipped=False):
+        with self.watchdog.hold():
+            self.run_hooks(self.hooks.AFTER)
+            self.tear_down()
+            self.coverage.end()
 
-    def after_run(self):
-        self.hooks.run(self.hooks.AFTER)
-        self.coverage.end()
+            if self.succeeded is None and not skipped:
+                self.try_succeed()
 
-        if self.succeeded is None:
-            self.try_succeed()
+            self.db.update_node(self)
+            self.clean_up()
 
-        self.db.update_node(self)
-        self.clean_up()
+    def chain(self, sources):
+        """Yield what each of <sources> yields, remembering them for parallel()."""
+        self.sources = list(sources)
+        self.transforms = ()
+        self.les_iterables = itertools.chain(*self.sources)
+        return self
 
     def classes(self, predicate=None):
-        self.les_iterables = itertools.chain(
-            *map(lambda x: x.classes(predicate), self.les_iterables)
-        )
-        return self
+        return self.chain(map(lambda x: x.classes(predicate), self.les_iterables))
 
     def functions(self, predicate=None):
-        self.les_iterables = itertools.chain(
-            *map(lambda x: x.functions(predicate), self.les_iterables)
-        )
-        return self
+        return self.chain(map(lambda x: x.functions(predicate), self.les_iterables))
 
     def modules(self, predicate=None):
-        self.les_iterables = itertools.chain(
-            *map(lambda x: x.modules(predicate), self.les_iterables)
-        )
-        return self
+        return self.chain(map(lambda x: x.modules(predicate), self.les_iterables))
 
     def methods(self, predicate=None):
-        self.les_iterables = itertools.chain(
-            *map(lambda x: x.methods(predicate), self.les_iterables)
+        return self.chain(map(lambda x: x.methods(predicate), self.les_iterables))
+
+    def each(self, transform):
+        """Apply <transform> to each runner we yield."""
+        self.les_iterables = map(transform, self.les_iterables)
+        self.transforms = tuple(self.transforms) + (transform,)
+        return self
+
+    def using(self, *fixtures):
+        """Pass <fixtures> to each runner we yield; see TestRunner.using."""
+        return self.each(lambda runner: runner.using(*fixtures))
+
+    def cached(self, depends=(), env=()):
+        """Mark each runner we yield as cached; see TestRunner.cached."""
+        return self.each(lambda runner: runner.cached(depends, env))
+
+    def parallel(self, workers=None):
+        """
+        Run the selected Function/Method runners in a pool of <workers> processes.
+
+        Each runner is yielded from inside the collection that yields it
+        (e.g. its Module for functions()), so that stays open, hooked and
+        timed while they run, like a serial run. Runners from the
+        collections after it are submitted ahead; see parallel.Lookahead.
+        """
+        pool = concurrent.futures.ProcessPoolExecutor(workers)
+        if not self.sources:
+            self.les_iterables = anaphora.parallel.dispatch(self.les_iterables, pool)
+            return self
+        lookahead = anaphora.parallel.Lookahead(pool, 2 * (workers or os.cpu_count() or 1))
+        for source in self.sources:
+            # transforms already asked for (cached(), using()) decide what's submitted
+            source.les_iterables = lookahead.add(
+                source,
+                functools.reduce(
+                    lambda runners, transform: map(transform, runners),
+                    self.transforms,
+                    source.les_iterables,
+                ),
+            )
+        self.les_iterables = anaphora.parallel.pooled(
+            itertools.chain(*self.sources), pool
         )
+        self.transforms = ()
         return self
 
-    def commands(self, commands):
-        self.les_iterables = map(Command, commands)
+    def commands(self, commands, concurrency=None, timeout=None, depends=None, env=()):
+        """
+        Run each of <commands>, up to <concurrency> at a time if given.
+
+        With <depends> (and <env>), each is cached() on them, so a command
+        whose inputs haven't changed since it last passed isn't run at all.
+        """
+        self.sources = ()
+        self.les_iterables = self.failed_first(
+            map(functools.partial(Command, timeout=timeout), commands)
+        )
+        if depends is not None:
+            self.cached(depends, env)
+        if concurrency:
+            self.les_iterables = anaphora.parallel.dispatch(
+                self.les_iterables,
+                concurrent.futures.ThreadPoolExecutor(concurrency),
+                check=None,
+            )
         self.before_run()
         return self
 
@@ -145,24 +240,57 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
     description = None
     parent = None
     nouns = None
+    child_totals = None  # running child stat totals; see Stat.fold
+    depth = 0
+    path = ""  # materialized path; see path_to
+    identity = None  # what makes us us among our siblings; see key_for
+    key = None
+    ordinals = None  # how many children with each identity we've seen
+
+    unit = False  # whether we decided our own shard; see in_shard
+    in_unit = False
+    rerunning = False  # whether our whole subtree runs under --last-failed
+    provided = ()  # subtree-scoped Fixtures we own; see provide
+    fixtures = None  # {Fixture: (value, teardown)} we own and have built; see use
+    skipped_trace = None  # (trace function, frame, its f_trace) when skip_body is used
+    budget = None  # seconds; set on a noun class to budget all of its nodes
+    deadline = None  # time.monotonic() by which we, or an ancestor, must finish
+    deadline_owner = None  # the node whose budget set our deadline
+    watchdog = anaphora.utils.WATCHDOG
 
     succeeded = None
     ignored = 0
+    cached_duration = None  # seconds the run a cached result came from took
     options = None
     reporter = None
 
     id = None  # this gets assigned after we're inserted in the db.
     _current = []  # intentionally class global.
-
-    def __init__(self, desc, before=None, after=None):
+    _root_ordinals = collections.Counter()  # ditto; ordinals for parentless nodes
+    _plan = None  # ditto; the run's anaphora.sharding.Plan
+    _failures = 0  # ditto; unignored exceptions recorded, for --max-failures
+    _failures_from = None  # ditto; the keys failures() read from a saved run
+    _impact = None  # ditto; the anaphora.discovery.Impact of --changed files
+    _unaffected = set()  # ditto; modules affected() turned away
+    _results = None  # ditto; the anaphora.cache.ResultCache, once opened
+    _cache_counts = collections.Counter()  # ditto; cached runners' hits and misses
+
+    def __init__(self, desc, before=None, after=None, budget=None):
         self.runtime = anaphora.utils.RuntimeTracker()
+        if budget is not None:
+            self.budget = budget
         # LATERDO: I hate doing config like this, but it's on the right track.
         if self.db is None:
             self.config(meta.Config())
         self.parent = self.current
+        if self.parent:
+            self.depth = self.parent.depth + 1
         self.description = desc
         self.exceptions = []
         self.nouns = []
+        self.child_totals = {}
+        self.ordinals = collections.Counter()
+        self.key = self.key_for()
 
         self.hooks = anaphora.utils.Hooks(before, after)
         self.coverage = anaphora.utils.Coverage()
@@ -175,6 +303,266 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
         else:
             return None
 
+    def path_to(self, node_id):
+        """
+        Set and return our materialized path, given the id the db assigned us.
+
+        Paths are our ancestors' fixed-width hex ids and ours, each followed by
+        a ".", so sorting on path yields the tree in depth-first order and a
+        subtree is a range of paths sharing its root's path as a prefix.
+        """
+        prefix = self.parent.path if self.parent else ""
+        self.path = "{}{:08x}.".format(prefix, node_id)
+        return self.path
+
+    def provide(self, *fixtures):
+        """Own subtree-scoped <fixtures>, so nodes under us share one value."""
+        self.provided = tuple(self.provided) + fixtures
+        return self
+
+    def owner(self, fixture):
+        """Return the node that owns <fixture>'s value for us (see Fixture)."""
+        node = self
+        if fixture.scope == "subtree":
+            while node is not None and fixture not in node.provided:
+                node = node.parent
+            return node or self
+        kinds = {"class": (Class, Module), "module": (Module,), "run": ()}[fixture.scope]
+        for kind in kinds:
+            node = self
+            while node is not None and not isinstance(node, kind):
+                node = node.parent
+            if node is not None:
+                return node
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def use(self, fixture):
+        """
+        Return <fixture>'s value, building it for its scope if this is the first use.
+
+        If building it fails, the failure is recorded on its owner, once, and
+        we (and every later user) are skipped instead of building it again.
+        """
+        owner = self.owner(fixture)
+        if owner.fixtures is None:
+            owner.fixtures = {}
+        if fixture not in owner.fixtures:
+            try:
+                owner.fixtures[fixture] = fixture.build(owner.runtime)
+            except Exception as exc:  # pylint: disable=broad-except
+                owner.fixtures[fixture] = None
+                owner.fail()
+                owner.exception(exceptions.FixtureError(owner).with_cause(exc))
+        if owner.fixtures[fixture] is None:
+            raise exceptions.SkipNode(self)
+        return owner.fixtures[fixture][0]
+
+    def tear_down(self):
+        """Tear down the fixtures we own, newest first; failures are recorded on us."""
+        for fixture, built in reversed(list((self.fixtures or {}).items())):
+            teardown = built and built[1]  # None if it failed to build
+            if teardown is None:
+                continue
+            try:
+                fixture.finish(teardown, self.runtime)
+            except Exception as exc:  # pylint: disable=broad-except
+                self.fail()
+                self.exception(exceptions.FixtureError(self).with_cause(exc))
+        self.fixtures = None
+
+    def run_hooks(self, kind):
+        if not self.stopped:  # once the run stops, hooks are skipped too
+            self.hooks.run(kind)
+
+    @property
+    def stopped(self):
+        """Whether the run has hit --max-failures, so nothing more should run."""
+        limit = self.options.get("max_failures") if self.options else None
+        return bool(limit) and Noun._failures >= limit
+
+    def skipped(self):
+        """Record that we didn't run, for runners reached after the run stopped."""
+        with self.watchdog.hold():
+            if not self.id:
+                self.__class__.id = self.db.add_noun(self.__class__)
+            self.id = self.db.add_node(self)  # pylint: disable=invalid-name
+            self.add()
+            self.db.update_node(self)
+            self.clean_up()
+
+    @classmethod
+    def failures(cls):
+        """
+        Return (failed keys, their ancestors' keys) from --last-failed/--failed-first.
+
+        Without a saved run to read them from, nothing failed, so everything
+        runs (in its usual order), with a warning.
+        """
+        if Noun._failures_from is None:
+            path = cls.options.get("last_failed") or cls.options.get("failed_first")
+            if path is True:  # the file --save would have written
+                path = "{}.db".format(cls.options.module)
+                if not os.path.exists(path):
+                    path = "{}-track.db".format(cls.options.module)
+            Noun._failures_from = set(), set()
+            if not os.path.exists(path):
+                print(
+                    "anaphora: no saved run at {}; running everything".format(path),
+                    file=sys.stderr,
+                )
+                return Noun._failures_from
+            try:
+                db = anaphora.db.QueryAPI.open(path)
+                try:
+                    Noun._failures_from = db.failures()
+                finally:
+                    db.close()
+            except sqlite3.DatabaseError as exc:  # includes OperationalError
+                print(
+                    "anaphora: can't read the saved run at {} ({}); running everything".format(
+                        path, exc
+                    ),
+                    file=sys.stderr,
+                )
+        return Noun._failures_from
+
+    def rerun(self):
+        """
+        Return whether we run under --last-failed.
+
+        Only nodes that failed last time, their ancestors and everything
+        inside them run. If nothing failed last time, everything runs.
+        """
+        if self.parent is None or not self.options.get("last_failed"):
+            return True
+        failed, ancestors = self.failures()
+        if not failed or self.parent.rerunning or self.key in failed:
+            self.rerunning = True
+            return True
+        return self.key in ancestors
+
+    def affected(self, module_str):
+        """
+        Return whether --changed/--changed-since files can affect <module_str>.
+
+        That is, whether it imports one (see anaphora.discovery.Impact).
+        Everything is affected without either option.
+        """
+        changed, since = self.options.get("changed"), self.options.get("changed_since")
+        if changed is None and since is None:
+            return True
+        if Noun._impact is None:
+            if since is not None:
+                changed = (changed or []) + anaphora.discovery.changed_since(since)
+            if Module.index is None:
+                Module.index = anaphora.discovery.Index()
+            Noun._impact = anaphora.discovery.Impact(changed, Module.index)
+        if Noun._impact.affected(module_str):
+            return True
+        Noun._unaffected.add(module_str)
+        return False
+
+    @property
+    def cache_counts(self):
+        """The run's cached results used ("hit") and runners cached ones ran ("miss")."""
+        return Noun._cache_counts
+
+    @property
+    def unaffected(self):
+        """The number of modules skipped because no --changed file affects them."""
+        return len(Noun._unaffected)
+
+    def failed_first(self, runners):
+        """Return <runners>, reordered for --failed-first once we start on them."""
+        if not self.options.get("failed_first"):
+            return runners
+
+        def ordered():
+            # sorting creates every runner; wait until we're the parent they'll get
+            failed, ancestors = self.failures()
+            yield from sorted(
+                runners, key=lambda runner: runner.key not in failed | ancestors
+            )
+
+        return ordered()
+
+    def in_shard(self):
+        """
+        Return whether we run in this shard (see --shard), deciding if need be.
+
+        Nodes are split between shards in units: the first nodes under the
+        run (or under a collection) that aren't just collections themselves.
+        A unit's shard comes from its key, and everything inside it follows.
+        """
+        if self.parent is None or self.parent.in_unit:
+            self.in_unit = self.parent is not None
+            return True
+        self.unit = self.in_unit = True
+        shard = self.options.get("shard")
+        if not shard:
+            return True
+        if Noun._plan is None:
+            timings = self.options.get("shard_timings")
+            Noun._plan = anaphora.sharding.Plan(
+                shard[1],
+                anaphora.sharding.Plan.read(timings) if timings else None,
+                self.options.get("shard_default"),
+            )
+        return Noun._plan.shard(self.key) == shard[0] - 1
+
+    def skip_body(self, frame):
+        """Skip the body of the with statement running in <frame>."""
+        self.skipped_trace = (sys.gettrace(), frame, frame.f_trace)
+        self.hooks.clear()  # we aren't running, so neither are our hooks
+
+        def skip(frame, event, arg):  # pylint: disable=unused-argument
+            raise exceptions.SkipNode(self)
+
+        # frames only call their f_trace while some trace function is set
+        sys.settrace(lambda *args, **kwargs: None)
+        frame.f_trace = skip
+
+    def start_budget(self):
+        """Start our budget's clock, keeping any earlier deadline we inherit."""
+        if self.parent is not None:
+            self.deadline = self.parent.deadline
+            self.deadline_owner = self.parent.deadline_owner
+        if self.budget is not None:
+            deadline = time.monotonic() + self.budget
+            if self.deadline is None or deadline < self.deadline:
+                self.deadline, self.deadline_owner = deadline, self
+        if self.deadline is not None:
+            self.watchdog.arm(self)
+
+    @property
+    def remaining(self):
+        """Seconds left before our (possibly inherited) deadline, or None."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def key_for(self):
+        """
+        Return a key that names this node the same way in every run.
+
+        The key hashes our parent's key, our noun's name, our identity (the
+        description, unless a runner has something steadier), and how many
+        siblings with the same noun and identity came before us.
+        """
+        identity = self.description if self.identity is None else self.identity
+        name = self.__class__.__name__
+        ordinals = self.parent.ordinals if self.parent else self._root_ordinals
+        ordinal = ordinals[(name, identity)]
+        ordinals[(name, identity)] += 1
+        parent = self.parent.key if self.parent else ""
+        return hashlib.blake2b(
+            "\0".join((parent, name, identity, str(ordinal))).encode(),
+            digest_size=8,
+        ).hexdigest()
+
     def add(self):
         # print("adding %s which has parent: %s" % (self, self.parent))
         self._current.append(self)
@@ -197,8 +585,9 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
     def config(options):
         Noun.options = options
         Noun.earmark = anaphora.utils.Earmarks(options)
+        anaphora.cover.configure(options.get("cover"))
         # print((cls, cls.options), file=sys.stderr)
-        anaphora.db.QueryAPI(options)
+        anaphora.db.connect(options)
 
     @property
     def db(self):  # pylint: disable=invalid-name,no-self-use
@@ -224,7 +613,7 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
     def _handle_exit_hooks(self, exc):
         """Return updated ExcInfo after running after hooks and consuming before/after errors."""
         exc = self._handle_exit_hook(exc, self.hooks.BEFORE)
-        self.hooks.run(self.hooks.AFTER)
+        self.run_hooks(self.hooks.AFTER)
         exc = self._handle_exit_hook(exc, self.hooks.AFTER)
         return exc
 
@@ -254,6 +643,18 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
         elif isinstance(exc.value, AssertionError):
             exc.upgrade_to(exceptions.TestFailure)
             self.exception(exc.value)
+        elif isinstance(exc.value, exceptions.NodeTimeout):
+            abandoned = self._current[self._current.index(self) + 1 :]
+            if exc.value.node is self:
+                self.exception(exc.value)
+            elif exc.value.node in abandoned:
+                # collections cut short by the timeout never reached after_run
+                for node in reversed(abandoned):
+                    if node is exc.value.node:
+                        node.exception(exc.value)
+                    node.fail()
+                    node.after_run()
+                exc = None
         # any kind of anaphora exception being handed up from a child node
         elif isinstance(exc.value, exceptions.TestRunException):
             exc.value.try_raise()
@@ -261,23 +662,40 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
         return exc, skip
 
     def __enter__(self):
-        if not self.id:
-            self.__class__.id = self.db.add_noun(self.__class__)
+        with self.watchdog.hold():
+            running = self.in_shard() and not self.stopped and self.rerun()
+            if not self.id:
+                self.__class__.id = self.db.add_noun(self.__class__)
 
-        self.id = self.db.add_node(self)
+            self.id = self.db.add_node(self)
 
-        self.environment.snapshot(inspect.currentframe())
-        self.add()
+            self.environment.snapshot(inspect.currentframe())
+            self.add()
+            if not running:
+                self.skip_body(inspect.currentframe().f_back)
+                return self
+            self.start_budget()
 
-        self.coverage.start()
+            self.coverage.start()
 
-        self.hooks.run(self.hooks.BEFORE)
+            self.run_hooks(self.hooks.BEFORE)
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):
+        with self.watchdog.hold():
+            return self._exit(exc_type, exc_value)
+
+    def _exit(self, exc_type, exc_value):
+        if self.skipped_trace is not None:
+            trace, frame, local = self.skipped_trace
+            frame.f_trace = local  # a trace function that raises loses it
+            sys.settrace(trace)
+            self.skipped_trace = None
         exc = anaphora.utils.ExcInfo(self, exc_value) if exc_type else None
         exc, skip = self._parse_exit_exception(exc)
         exc = self._handle_exit_hooks(exc)
+        self.tear_down()
+        self.coverage.end()
 
         if skip:
             pass
@@ -298,7 +716,12 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
         self.environment.restore()  # scrub namespace
         self.db.update_node(self)
         self.clean_up()
-        return True
+        # a timeout unwinds every node inside the one whose budget ran out
+        return not (
+            exc
+            and isinstance(exc.value, exceptions.NodeTimeout)
+            and exc.value.node is not self
+        )
 
     def stat(self, name):
         return Stat.stat(name).compute(self)
@@ -306,6 +729,8 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
     def clean_up(self):
         self.db.clean_up(self)
         self.remove()
+        if self.deadline is not None:
+            self.watchdog.arm(self.current)
 
     # LATERDO: since all of my binary fields that get databased should do this,
     # this should probably documented in a better more global place?
@@ -324,6 +749,10 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
         self.succeeded = 0
 
     def exception(self, exception):
+        if self.stopped:
+            return  # likely fallout from what the stop skipped; keep the first N
+        if not self.ignored:
+            Noun._failures += 1
         if not exception.initialized:
             exception.initialize()
         output = self.collect_output()
@@ -379,6 +808,19 @@ class Noun(RunnerMixin):  # pylint: disable=too-many-instance-attributes
 
 
 def clean_up():
+    Noun._root_ordinals.clear()
+    Noun._plan = None
+    Noun._failures = 0
+    Noun._failures_from = None
+    Noun._impact = None
+    Noun._unaffected.clear()
+    if Noun._results is not None:
+        Noun._results.close()
+        Noun._results = None
+    Noun._cache_counts.clear()
+    if Module.index is not None:
+        Module.index.save()
+    anaphora.cover.configure(None)
     anaphora.db.sql.clear_stats()
     anaphora.db.sql = None
 
@@ -394,6 +836,11 @@ class TestRunner(Noun):
     """
 
     runnable = False
+    parallelizable = False
+    outcome = None  # a future for our Result when run in parallel; see replay
+    uses = ()  # Fixtures passed to our test by name; see using
+    depends = None  # file globs our cached results depend on, once we're cached()
+    env = ()  # ...and the environment variables they depend on
 
     def __init__(self, test, *args, **kwargs):
         self.test = test
@@ -403,19 +850,38 @@ class TestRunner(Noun):
         if hasattr(test, "__self__"):
             name += test.__self__.__class__.__name__ + "."
         name += test.__name__
+        # descriptions use the instance's class; keys use where it was defined
+        self.identity = "{}.{}".format(
+            getattr(test, "__module__", ""),
+            getattr(test, "__qualname__", test.__name__),
+        )
         super().__init__(name, *args, **kwargs)
 
     def run(self, *args, **kwargs):
+        if not self.in_shard():
+            return None
+        if self.stopped or not self.rerun():
+            return self.skipped()
         self.before_run()
         ran = None
+        skipped = False
 
         # LATERDO: figure out how to use ExcInfo?
         try:
-            ran = self.execute(*args, **kwargs)
+            for fixture in self.uses:
+                kwargs.setdefault(fixture.name, self.use(fixture))
+            ran = self.execute_cached(*args, **kwargs)
             self.try_succeed()
-        except exceptions.TestFailure as exc:
+        except exceptions.SkipNode:
+            skipped = True  # a fixture we use is broken; see use()
+        except (exceptions.TestFailure, exceptions.TestError) as exc:
             self.exception(exc)
             exc.try_raise()
+        except exceptions.NodeTimeout as exc:
+            self.fail()
+            if exc.node is not self:
+                raise
+            self.exception(exc)
         except subprocess.CalledProcessError as exc:
             self.fail()
             raise exceptions.TestFailure(self).with_cause(exc) from exc
@@ -433,20 +899,148 @@ class TestRunner(Noun):
                 self.exception(exc)
                 exc.try_raise()
         finally:
-            self.after_run()
+            self.after_run(skipped)
 
         return ran
 
     def execute(self, *args, **kwargs):
         raise NotImplementedError
 
+    def using(self, *fixtures):
+        """
+        Pass each of <fixtures>' values to our test as a keyword argument named after it.
+
+        If we're yielding runners (e.g. a Class's methods()), they get them too.
+        """
+        self.uses = tuple(self.uses) + fixtures
+        if self.les_iterables is not None:
+            super().using(*fixtures)
+        return self
+
+    def cached(self, depends=(), env=()):
+        """
+        Reuse what we returned last time, while nothing that went into it changed.
+
+        That's our code (see fingerprint), the files matching the globs in
+        <depends>, the environment variables named in <env> and our
+        arguments. Results are only stored from passing runs, and a failure
+        discards every result we stored. Cached passes record how long the
+        original run took in the "cached" stat.
+        """
+        self.depends, self.env = list(depends), list(env)
+        return self
+
+    def fingerprint(self):
+        """Return (code, source files) our results depend on, or None if we can't cache."""
+        return None
+
+    @classmethod
+    def results(cls):
+        if Noun._results is None:
+            limit = cls.options.get("cache_size")
+            Noun._results = anaphora.cache.ResultCache(
+                limit=None if limit is None else int(limit * (1 << 20))
+            )
+        return Noun._results
+
+    def cache_key(self, args, kwargs):
+        """Return the key our result for <args> and <kwargs> is cached under, or None."""
+        fingerprint = self.fingerprint()
+        if self.depends is None or fingerprint is None:
+            return None
+        try:
+            arguments = pickle.dumps((args, sorted(kwargs.items())))
+        except Exception:  # pylint: disable=broad-except
+            return None
+        code, sources = fingerprint
+        # a glob matching nothing hashes as a missing file, so adding one counts
+        files = list(sources) + [
+            filename
+            for pattern in self.depends
+            for filename in sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        ]
+        return anaphora.cache.fingerprint(
+            self.identity,
+            code,
+            arguments,
+            *(
+                ["{}={}".format(key, os.environ.get(key)) for key in self.env]
+                + [
+                    part
+                    for filename in files
+                    for part in (filename, anaphora.cache.hash_file(filename))
+                ]
+            )
+        )
+
+    def cache_hit(self):
+        """Return whether a call without arguments would be replayed from the cache."""
+        key = self.cache_key((), {})
+        return (
+            key is not None
+            and not self.options.get("no_cache")
+            and self.results().get(key) is not None
+        )
+
+    def execute_cached(self, *args, **kwargs):
+        """execute(), unless we're cached and have a result for exactly this run."""
+        key = self.cache_key(args, kwargs)
+        if key is None:
+            return self.execute(*args, **kwargs)
+        results = self.results()
+        hit = None if self.options.get("no_cache") else results.get(key)
+        if hit is not None:
+            self._cache_counts["hit"] += 1
+            if self.outcome is not None:
+                self.outcome.cancel()
+            value, self.cached_duration = hit
+            return value
+        self._cache_counts["miss"] += 1
+        started = time.perf_counter()
+        try:
+            value = self.execute(*args, **kwargs)
+        except BaseException:
+            results.discard(self.identity)
+            raise
+        if self.succeeded == 0:  # e.g. a Command records its failure and returns
+            results.discard(self.identity)
+        else:
+            results.put(key, self.identity, value, time.perf_counter() - started)
+        return value
+
+    def submit(self, pool):
+        """Start our test on <pool> and return the future of its Result (see replay)."""
+        return pool.submit(anaphora.parallel.execute, self.test)
+
+    def replay(self):
+        """Return or raise what our test did in a worker process, as if it ran here."""
+        result = self.outcome.result()
+        if result.output:
+            print(result.output, end="")  # into the trap, like a local run
+        self.runtime.rewind(result.duration)
+        if result.cause is None:
+            return result.value
+        kind = exceptions.TestFailure if result.cause.failed else exceptions.TestError
+        raise kind(self).with_remote_cause(result.cause)
+
 
 class Callable(TestRunner):
     runnable = True
+    parallelizable = True
 
     def execute(self, *args, **kwargs):
+        if self.outcome is not None:
+            if not (args or kwargs):
+                return self.replay()
+            self.outcome.cancel()  # the worker called it without our arguments
         return self.test(*args, **kwargs)
 
+    def fingerprint(self):
+        test = getattr(self.test, "__func__", self.test)
+        module = sys.modules.get(test.__module__)
+        source = getattr(module, "__file__", None)
+        return marshal.dumps(test.__code__), [source] if source else []
+
 
 class Function(Callable):
     pass
@@ -476,12 +1070,15 @@ class Class(TestRunner):
 class Module(TestRunner):
 
     runnable = True
+    index = None  # the discovery index shared by every Module; see summary
+    _summary = None
 
     def __init__(self, module_str, *args, **kwargs):
-        self.delay_init = module_str
+        self.delay_init = self.identity = module_str
         self.lazy_constructor = self._construct()
+        # named up front; we're recorded before (or without) importing
         super(TestRunner, self).__init__(
-            "", *args, **kwargs
+            module_str, *args, **kwargs
         )  # pylint: disable=bad-super-call
 
     @property
@@ -503,34 +1100,95 @@ class Module(TestRunner):
         while True:
             yield self._test
 
+    def __iter__(self):
+        if not self.iterates():
+            self.skipped()
+            return iter(())
+        return super().__iter__()
+
+    def iterates(self):
+        return self.affected(self.identity)
+
+    def run(self, *args, **kwargs):
+        if not self.affected(self.identity):
+            return self.skipped()
+        return super().run(*args, **kwargs)
+
     def execute(self, *args, **kwargs):
         return self.construct()
 
+    # no fingerprint(): what a Module runs is its import and the runners it
+    # yields, none of which a cached result could stand in for
+
     @convert(lambda x: Module(x))  # pylint: disable=unnecessary-lambda
     def modules(self):  # pylint: disable=arguments-differ
         return inspect.getmembers(self.test, inspect.ismodule)
 
+    @property
+    def summary(self):
+        """Our functions and classes from the discovery index, if we use it."""
+        if self._summary is None and self.options.get("static_discovery"):
+            if Module.index is None:
+                Module.index = anaphora.discovery.Index()
+            self._summary = Module.index.summary(self.identity) or {}
+        return self._summary
+
+    def members(self, kind, test):
+        """Return (name, object) pairs, from the index without importing if we can."""
+        if self.summary:
+            return [
+                (name, anaphora.discovery.Member(self, name))
+                for name in sorted(self.summary[kind])
+            ]
+        return inspect.getmembers(self.test, test)
+
     @convert(Class)
     def classes(self):  # pylint: disable=arguments-differ
-        return inspect.getmembers(self.test, inspect.isclass)
+        return self.members("classes", inspect.isclass)
 
     @convert(Function)
     def functions(self):  # pylint: disable=arguments-differ
-        return inspect.getmembers(self.test, inspect.isfunction)
+        return self.members("functions", inspect.isfunction)
 
 
 class Command(TestRunner):
     runnable = True
-
-    def __init__(self, test, *args, **kwargs):
-        name = self.test = test
+    parallelizable = True
+    output_limit = 1 << 20  # bytes of output kept in memory; the rest is spooled
+    timeout = None
+    timed_out = False
+    spool = None
+
+    def __init__(self, test, *args, timeout=None, **kwargs):
+        name = self.test = self.identity = test
         super(TestRunner, self).__init__(
             name, *args, **kwargs
         )  # pylint: disable=bad-super-call
+        if timeout is None:
+            timeout = self.options.get("command_timeout")
+        self.timeout = timeout
+
+    def submit(self, pool):
+        return pool.submit(
+            anaphora.parallel.shell, self.test, self.timeout, self.output_limit
+        )
+
+    def fingerprint(self):
+        """Commands are keyed on their command line and what they were cached() with."""
+        return b"", []
 
     def execute(self, *args, **kwargs):
         self.release_output()
-        status, output = subprocess.getstatusoutput(self.test)
+        if self.remaining is not None:
+            self.timeout = min(self.timeout or self.remaining, self.remaining)
+        with self.watchdog.hold():  # the timeout has our budget covered
+            if self.outcome is None:
+                status, self.spool, self.timed_out = anaphora.utils.spawn(
+                    self.test, self.timeout, self.output_limit
+                )
+            else:
+                status, self.spool, self.timed_out = self.replay()
+        output = self.spool.text()
 
         if status:
             stack = inspect.stack()
@@ -542,5 +1200,7 @@ class Command(TestRunner):
                     )
                     self.fail()
                     break
+        else:
+            self.spool.discard()  # only failures point at their full output
         self.capture_output()
         return status, output
@@ -0,0 +1,71 @@
+"""Assign shard units (see Noun.in_shard) to shards."""
+import pathlib
+import sqlite3
+
+
+class Plan(object):
+
+    """
+    Decide which of <count> shards runs each unit, given the units' keys.
+
+    Without timings, a unit's shard comes from its key alone. With timings
+    from a previous run ({key: seconds}), the known units are packed first,
+    longest first, each onto the least-loaded shard. Units without history
+    are packed the same way as they turn up, costed at <default> seconds
+    (the mean of the known timings if not given). Every shard sees every
+    unit in the same order, so they all arrive at the same plan.
+    """
+
+    def __init__(self, count, timings=None, default=None):
+        self.count = count
+        self.timings = timings
+        self.loads = [0.0] * count
+        self.assigned = {}
+        if timings:
+            for key, during in sorted(timings.items(), key=lambda item: (-item[1], item[0])):
+                self.assign(key, during)
+        if default is None:
+            default = sum(timings.values()) / len(timings) if timings else 1.0
+        self.default = default
+
+    def assign(self, key, during):
+        shard = min(range(self.count), key=lambda index: (self.loads[index], index))
+        self.loads[shard] += during
+        self.assigned[key] = shard
+        return shard
+
+    def shard(self, key):
+        """Return the 0-based shard that runs the unit with <key>."""
+        if self.timings is None:
+            return int(key, 16) % self.count
+        if key in self.assigned:
+            return self.assigned[key]
+        return self.assign(key, self.default)
+
+    @staticmethod
+    def read(path):
+        """
+        Return {key: during} for the units that ran in the results database at <path>.
+
+        Units skipped by sharding are ignored, so the databases of every
+        shard of a run can be merged (see anaphora.merge) and read at once.
+        In track databases, each unit's latest run counts.
+        """
+        db = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True)
+        try:
+            columns = {row[1] for row in db.execute("PRAGMA table_info(nodes);")}
+            if "run_id" in columns:
+                rows = db.execute(
+                    """SELECT key, during FROM nodes AS latest
+                    WHERE unit=1 AND succeeded IS NOT NULL AND run_id=(
+                        SELECT max(run_id) FROM nodes
+                        WHERE key=latest.key AND succeeded IS NOT NULL
+                    );"""
+                )
+            else:
+                rows = db.execute(
+                    "SELECT key, max(during) FROM nodes WHERE unit=1 AND succeeded IS NOT NULL GROUP BY key;"
+                )
+            return {key: during or 0.0 for key, during in rows}
+        finally:
+            db.close()
@@ -38,6 +38,10 @@ class Stat(object):
     all_stats_go_to_heaven = {}  # class global
 
     aggregator = "all"
+    AGGREGATE_SQL = {
+        "all": "total(child_{name})+total({name}) as ag_{name}",
+        "children": "(CASE WHEN sum(child_{name}) IS NULL THEN total({name}) ELSE total(child_{name}) END) as ag_{name}",
+    }
 
     @property
     def how_to_aggregate_me(self):
@@ -68,11 +72,8 @@ class Stat(object):
         # more work to use without all kwargs present.
         self.how_to = {
             "create": "{name} {type} DEFAULT 0, child_{name} {type} DEFAULT 0",
-            "update": "{name}=?, child_{name}=(SELECT ag_{name} FROM ag)",
-            "aggregate": {
-                "all": "total(child_{name})+total({name}) as ag_{name}",
-                "children": "(CASE WHEN sum(child_{name}) IS NULL THEN total({name}) ELSE total(child_{name}) END) as ag_{name}",
-            },
+            "update": "{name}=?, child_{name}=?",
+            "aggregate": dict(self.AGGREGATE_SQL),
         }
         self.name = None
 
@@ -80,6 +81,11 @@ class Stat(object):
     def stat(cls, name):
         return cls.all_stats_go_to_heaven[name]
 
+    @classmethod
+    def aggregate_sql(cls, name, aggregator):
+        """Return the aggregate sql for a stat without declaring one (see merge)."""
+        return cls.AGGREGATE_SQL[aggregator].replace("{name}", name)
+
     @classmethod
     def rapture(cls):
         cls.all_stats_go_to_heaven = {}
@@ -112,6 +118,28 @@ class Stat(object):
     def compute(self, node):
         return self.__cache[node]
 
+    # aggregate/fold mirror the SQL in how_to["aggregate"] (still used by the
+    # aggregate view) so nodes don't have to query their children on exit.
+    def aggregate(self, node):
+        """Return the child_{name} value for <node> from totals its children folded in."""
+        totals = node.child_totals.get(self.name)
+        if totals is None:
+            return None  # no children; the view would have no row, so NULL
+        value, child, child_seen = totals
+        if self.aggregator == "all":
+            return child + value
+        return child if child_seen else value
+
+    def fold(self, node, value, child):
+        """Add <node>'s <value> and <child> aggregate to its parent's running totals."""
+        if node.parent is None:
+            return
+        totals = node.parent.child_totals.setdefault(self.name, [0, 0, False])
+        totals[0] += value or 0
+        if child is not None:
+            totals[1] += child
+            totals[2] = True
+
     @property
     def create_sql(self):
         if self.initialized:
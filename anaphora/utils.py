@@ -1,10 +1,17 @@
+import contextlib
 import datetime
+import os
+import signal
+import subprocess
 import sys
+import tempfile
+import threading
+import time
 from collections import defaultdict
 from io import StringIO
 from packaging.specifiers import SpecifierSet
 
-from anaphora import exceptions
+from anaphora import cover, exceptions
 
 
 # Adapted from code by Oren Tirosh, MIT license per http://code.activestate.com/recipes/578231-probably-the-fastest-memoization-decorator-in-the-/
@@ -73,6 +80,164 @@ class CaptureOutput(list):
 STDOUT_TRAP = CaptureOutput()
 
 
+class Spool(object):
+
+    """
+    Hold a command's output in memory up to <limit> bytes, spilling to disk past that.
+
+    Once spilled, the whole output goes to a temp file and we only keep the
+    first and last <limit>/2 bytes in memory, so text() stays bounded no
+    matter how much the command prints.
+    """
+
+    path = None
+    _file = None
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.head = bytearray()
+        self.tail = bytearray()
+
+    def write(self, data):
+        if self._file is None:
+            self.head += data
+            if len(self.head) <= self.limit:
+                return
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="anaphora-", suffix=".log", delete=False
+            )
+            self.path = self._file.name
+            self._file.write(self.head)
+            self.tail = self.head[-(self.limit // 2) :]
+            del self.head[self.limit // 2 :]
+        else:
+            self._file.write(data)
+            self.tail += data
+            del self.tail[: -(self.limit // 2)]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self):
+        """Remove the spool file, if any; nobody needs the full output."""
+        if self.path is not None:
+            os.unlink(self.path)
+            self.path = None
+
+    def text(self):
+        """Return the output (truncated if we spilled), minus one trailing newline."""
+        if self.path is None:
+            out = self.head.decode(errors="replace")
+        else:
+            out = "{}\n... output truncated; full output in {} ...\n{}".format(
+                self.head.decode(errors="replace"),
+                self.path,
+                self.tail.decode(errors="replace"),
+            )
+        # like subprocess.getstatusoutput, which this replaces
+        return out[:-1] if out.endswith("\n") else out
+
+
+def spawn(command, timeout=None, limit=1 << 20):
+    """
+    Run shell <command> in its own session, streaming its output into a Spool.
+
+    Return (exit status, spool, timed_out). Past <timeout> seconds the whole
+    process group is killed, so a hung command can't leave children behind.
+    """
+    spool = Spool(limit)
+    proc = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+
+    def drain():
+        for chunk in iter(proc.stdout.read1, b""):
+            spool.write(chunk)
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    timed_out = False
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # it finished on its own after all
+        proc.wait()
+    # a grandchild that left our session could hold the pipe open forever
+    reader.join(timeout)
+    if not reader.is_alive():
+        proc.stdout.close()
+    spool.close()
+    return proc.returncode, spool, timed_out
+
+
+class Watchdog(object):
+
+    """
+    Raise NodeTimeout in the main thread once the innermost node's deadline passes.
+
+    Deadlines are enforced with signal.setitimer, so budgets are only
+    enforced in the main thread of platforms that have it. While anaphora
+    itself is busy (entering or exiting nodes, writing to the db, waiting on
+    a command), the watchdog is held and the alarm is retried shortly after.
+    """
+
+    retry = 0.01
+    node = None
+    held = 0
+    installed = False
+
+    def install(self):
+        if not self.installed:
+            if not hasattr(signal, "setitimer"):
+                return False
+            if threading.current_thread() is not threading.main_thread():
+                return False
+            signal.signal(signal.SIGALRM, self.bark)
+            self.installed = True
+        return True
+
+    def arm(self, node):
+        """Set the alarm for <node>'s deadline, or clear it if there is none."""
+        self.node = node
+        deadline = node.deadline if node is not None else None
+        if deadline is None:
+            if self.installed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        elif self.install():
+            signal.setitimer(
+                signal.ITIMER_REAL, max(deadline - time.monotonic(), 1e-6)
+            )
+
+    @contextlib.contextmanager
+    def hold(self):
+        """Keep the alarm from interrupting anaphora's own bookkeeping."""
+        self.held += 1
+        try:
+            yield
+        finally:
+            self.held -= 1
+
+    def bark(self, signum, frame):  # pylint: disable=unused-argument
+        if self.node is None or self.node.deadline is None:
+            return
+        if self.held:
+            signal.setitimer(signal.ITIMER_REAL, self.retry)
+            return
+        raise exceptions.NodeTimeout(self.node.deadline_owner)
+
+
+WATCHDOG = Watchdog()
+
+
 class Hooks(defaultdict):
     BEFORE = 0
     AFTER = 1
@@ -117,34 +282,23 @@ class Hooks(defaultdict):
 
 
 class Coverage(object):
-    coverage = None
-
-    def __init__(self):
-        # LATERDO: will be interesting to figure out how to db this, perhaps it can wait
-        # coverage stats disabled for now
-        # self.coverage = {}
-        pass
-
-    def start(self):  # pylint: disable=no-self-use
-        return
-        # self.cov = coverage.coverage(branch=True)
-        # self.cov.start()
-        # LATERDO: turn coverage back on?
-        # self.cov = coverage.coverage(branch=True, omit="*anaphora/__init__.py")#, , omit=["test.py", "*colorama*"]plugins=["plugin"]
-        # in the cli model this is parsed out of the command options...
-        # print(__file__)
-        # self.coverage.start()
-        # self.cov = coverage.coverage(branch=True)
-        # self.cov = coverage.coverage(branch=True, omit=[__file__, "*anaphora/__init__.py"])
-        # self.cov = coverage.coverage(branch=True, omit=["*%s.py" % self.options.file, "*anaphora/__init__.py"])
-        # self.cov.start()
-
-    def end(self):  # pylint: disable=no-self-use
-        return
-        # self.cov.stop()
-        # self.cov.save()
-        # reporter = cover.Dict(self.cov, self.cov.config)
-        # self.coverage = reporter.statistics(None)
+
+    """
+    The lines a node runs itself while --cover is on; see anaphora.cover.
+
+    Lines run inside a child node are the child's.
+    """
+
+    lines = None  # {filename: set of line numbers}, once started
+
+    def start(self):
+        if cover.TRACER is not None and self.lines is None:
+            self.lines = {}
+            cover.TRACER.push(self.lines)
+
+    def end(self):
+        if cover.TRACER is not None and self.lines is not None:
+            cover.TRACER.pop(self.lines)
 
 
 # There's some reasonable debate about whether this should attempt to rollback other namespace changes, but for now it just kills anything added after we started
@@ -182,6 +336,12 @@ class RuntimeTracker(defaultdict):
         """Remove a timer and return its present accumulated time."""
         return datetime.datetime.utcnow() - self.timers.pop(timer)
 
+    def rewind(self, duration, timer=None):
+        """Restart <timer> as though it had been started <duration> seconds ago."""
+        self.timers[timer] = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=duration
+        )
+
     def checkpoint(self, name, previous=None, timer=None):
         """
         Save and return time accumulated in <timer> from <previous> checkpoint.
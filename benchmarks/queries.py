@@ -0,0 +1,94 @@
+"""
+Show query plans and timings for QueryAPI over synthetic saved databases.
+
+Usage: python -m benchmarks.queries [NODES ...]
+
+Each database is built with the Tree reporter's stats as a 10-ary tree of
+NODES nodes with an exception on every 100th node, saved the way a run
+with --save would save it, and reopened with QueryAPI.open.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from anaphora.db import QueryAPI
+from anaphora.reporters import Tree
+
+BRANCHING = 10
+SIZES = (10000, 100000, 1000000)
+
+
+def nodes(size):
+    """Yield node rows for a BRANCHING-ary tree with depths and paths filled in."""
+    depths, paths = [None, 0], [None, "{:08x}.".format(1)]
+    yield 1, "node 1", None, 0, paths[1], random.random()
+    for i in range(2, size + 1):
+        parent = (i - 2) // BRANCHING + 1
+        depths.append(depths[parent] + 1)
+        paths.append("{}{:08x}.".format(paths[parent], i))
+        yield i, "node %d" % i, parent, depths[i], paths[i], random.random()
+
+
+def build(path, size):
+    db = QueryAPI(None)
+    db.track_stats(Tree.tracked_stats())
+    db.execute("INSERT INTO nouns (id, name) VALUES (1, 'bench');")
+    db.execute("BEGIN;")
+    db.executemany(
+        "INSERT INTO nodes (id, description, parent_id, noun_id, depth, path, during, succeeded, ignore) VALUES (?, ?, ?, 1, ?, ?, ?, 1, 0);",
+        nodes(size),
+    )
+    db.executemany(
+        "INSERT INTO exceptions (e_class, e_message, node_id, ignore) VALUES ('TestFailure', ?, ?, ?);",
+        (("failure %d" % i, i, i % 3) for i in range(100, size + 1, 100)),
+    )
+    db.execute("COMMIT;")
+    db.dbname = path
+    db.persist(final=True)
+    db.close()
+
+
+def queries():
+    sql = QueryAPI.queries
+    return (
+        ("tree()", sql["tree"], ()),
+        ("tree(2)", sql["node_tree"], (2,)),
+        ("depths()", sql["depths"], ()),
+        ("depth(depth=3)", sql["depth"], (3,)),
+        ("exceptions()", sql["exceptions"], ()),
+        ("warnings(count=True)", "SELECT count(*) FROM exceptions WHERE ignore == 2;", ()),
+    )
+
+
+def bench(size):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench-%d.db" % size)
+        started = time.perf_counter()
+        build(path, size)
+        print(
+            "== {:,} nodes (built in {:.2f}s) ==".format(size, time.perf_counter() - started)
+        )
+
+        db = QueryAPI.open(path)
+        try:
+            for name, query, params in queries():
+                plan = db.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+                started = time.perf_counter()
+                rows = sum(1 for _ in db.execute(query, params))
+                elapsed = time.perf_counter() - started
+                print("{:<22}{:>10,} rows {:>10.4f}s".format(name, rows, elapsed))
+                for step in plan:
+                    print("    " + step["detail"])
+        finally:
+            db.close()
+
+
+def main():
+    for size in map(int, sys.argv[1:]) if len(sys.argv) > 1 else SIZES:
+        bench(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,14 @@ setup(
     author="Travis A. Everett",
     author_email="travis.a.everett+anaphora@gmail.com",
     install_requires=["colorama", "packaging"],
+    extras_require={"columnar": ["numpy"]},
     tests_require=["coverage", "flake8", "pep257"],  # tdver, , ?
     packages=["anaphora"],
-    entry_points={"console_scripts": ["anaphora = anaphora.cli:main"]},
+    entry_points={
+        "console_scripts": [
+            "anaphora = anaphora.cli:main",
+            "anaphora-merge = anaphora.merge:main",
+        ]
+    },
     **Config(),
 )
@@ -0,0 +1,27 @@
+import os
+import sys
+
+from anaphora import Noun
+from anaphora.exceptions import TestError
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["requirement"])
+
+value = os.environ["ANAPHORA_TEST_VALUE"]
+value = int(value) if value.isdigit() else value
+with open(os.environ["ANAPHORA_TEST_LOG"], "a") as log:
+    for module in requirement("modules run every time").load(["tests.test3"]).cached():
+        module.run()
+        log.write("{} {}\n".format(module.cached_duration is not None, "tests.test3" in sys.modules))
+    for func in (
+        requirement("cache a function's result")
+        .load(["tests.test3"])
+        .functions(lambda name: name == "test1")
+        .cached(depends=["depends"])
+    ):
+        if value == "x":
+            func.ignore()
+        try:
+            log.write("{} {}\n".format(func.run(value), func.cached_duration is not None))
+        except TestError:
+            log.write("None False\n")
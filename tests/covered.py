@@ -0,0 +1,18 @@
+from anaphora import Noun
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["unit"])
+
+
+def double(value):
+    return value * 2  # inner
+
+
+with unit("outer"):
+    doubled = double(2)  # outer
+    with unit("inner"):
+        assert double(3) == 6  # inner
+    with unit("skipped") as skipped:
+        skipped.skip()
+        doubled = 0  # never
+    assert doubled == 4  # outer
@@ -0,0 +1,35 @@
+import os
+
+from anaphora import Noun
+from anaphora.exceptions import TestFailure
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["unit"])
+
+
+def log(name):
+    with open(os.environ["ANAPHORA_TEST_LOG"], "a") as ran:
+        ran.write(name)
+
+
+def check_e():
+    log("e")
+
+
+def check_f():
+    log("f")
+    assert False, "intentional failure"
+
+
+for name in "abcd":
+    with unit(name):
+        log(name)
+        assert name not in "bc", "intentional failure"
+
+for check in unit("checks").load(["tests.failing"]).functions(
+    lambda name: name.startswith("check_")
+):
+    try:
+        check.run()
+    except TestFailure:
+        pass  # runners re-raise failures; we only want it recorded
@@ -0,0 +1,25 @@
+import sqlite3
+
+from anaphora import Noun
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["unit"])
+
+with unit("tree") as tree:
+    with unit("a"):
+        pass
+    # with -b 1 every write is flushed as it's made, but columnar nodes wait for SQL
+    assert tree.db.buffered(), "Nodes were exported before anything asked for SQL."
+    assert sqlite3.Connection.execute(tree.db, "SELECT count(*) FROM nodes;").fetchone()[0] == 0
+    assert tree.db.execute("SELECT count(*) FROM nodes;").fetchone()[0] == 3
+    assert not tree.db.buffered(), "SQL didn't export the nodes."
+
+# chained selectors list each Module's classes as it's iterated, so the
+# Module has exited before its Class runs
+for method in (
+    unit("chained")
+    .load(["tests.test_classes"])
+    .classes(lambda x: x == "JustMethods")
+    .methods()
+):
+    method.run()
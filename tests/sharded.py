@@ -0,0 +1,11 @@
+import os
+
+from anaphora import Noun
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["unit"])
+
+for name in "abcdefgh":
+    with unit(name):
+        with open(os.environ["ANAPHORA_TEST_LOG"], "a") as log:
+            log.write(name)
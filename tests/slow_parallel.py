@@ -0,0 +1,7 @@
+import time
+
+
+def sleeps_in_worker():
+    start = time.time()
+    time.sleep(0.05)
+    return start, time.time()
@@ -0,0 +1,21 @@
+import sqlite3
+
+from anaphora import Noun
+
+ANAPHORA = Noun("AnaphoraSingleton")
+ANAPHORA.grammar(["unit"])
+
+with unit("tree") as tree:
+    for name in "ab":
+        with unit(name):
+            with unit(name + "1"):
+                pass
+    with unit("failed") as failed:
+        failed.ignore()
+        assert False, "intentional failure"
+    with unit("counted"):
+        rows = tree.db.depths(tree.id).fetchall()
+        assert all(isinstance(row, sqlite3.Row) for row in rows)
+        assert [tuple(row) for row in rows] == [(0, 1), (1, 4), (2, 2)]
+        assert tree.db.depth(tree.id, 2)["count"] == 2
+        assert tree.db.depth(tree.id, 3) is None
@@ -1,4 +1,6 @@
 from anaphora import Noun
+from anaphora.exceptions import TestError, TestFailure
+import os
 import sys
 
 ANAPHORA = Noun("AnaphoraSingleton")
@@ -93,6 +95,143 @@ with app("Anaphora").grammar(["need", "goal", "requirement"]):
             with requirement("after_hook failure is tracked"):
                 assert len(tracker.after.exceptions), "After hook failure not tracked"
 
+            with requirement("identical exception output is stored once"):
+                hashes = tracker.db.execute(
+                    "SELECT DISTINCT e_output_hash FROM exceptions WHERE node_id IN (?, ?);",
+                    (tracker.before.id, tracker.after.id),
+                ).fetchall()
+                assert len(hashes) == 1, "Exception output wasn't deduplicated."
+
+            with requirement("long output is compressed") as this:
+                this.ignore()
+                tracker.long = this
+                print("compress me " * 100)
+                assert False, "intentional failure"
+
+            with requirement("stored output reads back intact"):
+                stored = tracker.db.execute(
+                    """SELECT payloads.zlib, length(payloads.data) AS size FROM exceptions
+                    JOIN payloads ON payloads.hash=exceptions.e_output_hash
+                    WHERE exceptions.node_id=?;""",
+                    (tracker.long.id,),
+                ).fetchone()
+                assert stored["zlib"] == 1, "Long output wasn't compressed."
+                assert stored["size"] < len("compress me " * 100), "Output grew."
+                read = {
+                    row["node_id"]: row for row in tracker.db.ignored_exceptions()
+                }[tracker.long.id]
+                exception = tracker.long.exceptions[0]
+                assert read["e_output"] == exception.output, "Output didn't round-trip."
+                assert read["e_traceback"] == exception.traceback.strip()
+
+    with need("share setup between nodes with fixtures") as sharing:
+        from anaphora import fixture
+
+        sharing.events = []
+
+        @fixture()
+        def counter():
+            sharing.events.append("setup")
+            yield len(sharing.events)
+            sharing.events.append("teardown")
+
+        @fixture(scope="class")
+        def shared():
+            sharing.events.append("shared")
+            return []
+
+        @fixture()
+        def leaky():
+            yield
+            yield  # intentional error; fixtures yield once
+
+        @fixture()
+        def broken():
+            sharing.events.append("broken")
+            raise RuntimeError("intentional setup failure")
+
+        @fixture(scope="class")
+        def shared_broken():
+            sharing.events.append("shared_broken")
+            raise RuntimeError("intentional setup failure")
+
+        shared_broken.name = "shared"  # what Fixtured's methods ask for
+
+        with goal("build fixtures on first use, once per scope").provide(counter) as this:
+            assert sharing.events == [], "The fixture was built before it was used."
+            with requirement("the first use builds it") as using:
+                assert using.use(counter) == 1
+            with requirement("later uses share it") as using:
+                assert using.use(counter) == 1
+                assert sharing.events == ["setup"], "The fixture was built twice."
+                sharing.user = using
+            sharing.provider = this
+
+        with goal("tear fixtures down when their scope exits"):
+            assert sharing.events == ["setup", "teardown"]
+            provider, user = sharing.db.execute(
+                "SELECT setup, teardown FROM nodes WHERE id IN (?, ?) ORDER BY id;",
+                (sharing.provider.id, sharing.user.id),
+            ).fetchall()
+            assert provider["setup"] > 0, "Fixture setup time wasn't recorded."
+            assert provider["teardown"] > 0, "Fixture teardown time wasn't recorded."
+            assert (user["setup"], user["teardown"]) == (0, 0), "A user was charged for the fixture."
+
+        with goal("pass fixtures to test methods by name"):
+            for cls in (
+                requirement("share one value across a class")
+                .load(["tests.test_classes"])
+                .classes(lambda x: x == "Fixtured")
+            ):
+                for method in cls.methods().using(shared):
+                    method.run()
+            assert sharing.events.count("shared") == 1, "The class fixture was rebuilt."
+
+        with goal("broken teardowns are tracked") as this:
+            with requirement("a fixture yields twice") as using:
+                using.ignore()
+                using.use(leaky)
+                sharing.leaking = using
+            with requirement("the failure is recorded on its owner"):
+                assert sharing.leaking.succeeded == 0, "Broken teardown wasn't a failure."
+                assert [
+                    exc.__class__.__name__ for exc in sharing.leaking.exceptions
+                ] == ["FixtureError"], "Broken teardown wasn't tracked."
+
+        with goal("broken setups are tracked"):
+            sharing.unbuilt = []
+            with requirement("users of a fixture that fails to build").provide(broken) as this:
+                this.ignore()
+                sharing.breaking = this
+                for name in ("first", "second"):
+                    with requirement("the {} user is skipped".format(name)) as using:
+                        sharing.unbuilt.append(using)
+                        using.use(broken)
+                        sharing.events.append("used")
+            for cls in (
+                requirement("methods using a class fixture that fails to build")
+                .load(["tests.test_classes"])
+                .classes(lambda x: x == "Fixtured")
+            ):
+                cls.ignore()
+                for method in cls.methods().using(shared_broken):
+                    method.run()
+                    sharing.unbuilt.append(method)
+                sharing.breaking_class = cls
+            with requirement("the failure is recorded once, on its owner"):
+                assert sharing.events.count("broken") == 1, "The broken fixture was rebuilt."
+                assert sharing.events.count("shared_broken") == 1, "The broken fixture was rebuilt."
+                assert "used" not in sharing.events, "A user ran without its fixture."
+                for owner in (sharing.breaking, sharing.breaking_class):
+                    assert owner.succeeded == 0, "Broken setup wasn't a failure."
+                    assert [
+                        exc.__class__.__name__ for exc in owner.exceptions
+                    ] == ["FixtureError"], "Broken setup wasn't tracked."
+                assert len(sharing.unbuilt) == 4
+                for using in sharing.unbuilt:
+                    assert using.succeeded is None, "A user of a broken fixture wasn't skipped."
+                    assert using.exceptions == [], "The failure was recorded on a user."
+
     with need("queryable testing statistics") as parent:
         with goal("track runtime"):
             with requirement("checkpoint has been set") as funtime:
@@ -119,18 +258,333 @@ with app("Anaphora").grammar(["need", "goal", "requirement"]):
                 == 1
             )
 
-    with need("queryable coverage statistics") as bleh:
-        bleh.skip()  # coverage integration delayed
-        with goal("coverage statistics are computed as tests run"):
+        with goal("subtrees are queryable") as subtree:
+            with requirement("first child"):
+                pass
+            with requirement("second child"):
+                pass
+            depths = [row["depth"] for row in subtree.db.tree(subtree.id)]
+            assert depths == [0, 1, 1], "Subtree wasn't selected in tree order."
+            assert subtree.db.depth(subtree.id, 1)["count"] == 2
+
+        with goal("nodes have stable keys") as keyed:
+            keyed.twins = []
+            for _ in range(2):
+                with requirement("twin") as twin:
+                    keyed.twins.append(twin)
+            first, second = keyed.twins
+            assert first.key != second.key, "Same-named siblings share a key."
+            assert keyed.db.node(first.id)["key"] == first.key, "Key wasn't stored."
+
+        with goal("run metadata is recorded"):
+            run = parent.db.execute("SELECT * FROM main.runs;").fetchone()
+            assert run["started"] and run["host"], "Run metadata wasn't recorded."
+
+        with goal("history is tracked across saved runs") as tracking:
+            import tempfile
+            from anaphora.db import QueryAPI
+
+            tracking.tmp = tempfile.TemporaryDirectory()
+            run = "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.covered -s track".format(
+                tracking.tmp.name, os.getcwd(), sys.executable
+            )
+            for command in requirement("save the same suite twice").commands([run, run]):
+                command.run()
+            db = QueryAPI.open(os.path.join(tracking.tmp.name, "tests.covered-track.db"))
+            tracking.runs = db.runs().fetchall()
+            key = db.execute(
+                "SELECT key FROM nodes WHERE description='inner' LIMIT 1;"
+            ).fetchone()["key"]
+            tracking.history = db.history(key).fetchall()
+            tracking.succeeded = [row["value"] for row in db.history(key, "succeeded")]
+            db.close()
+            tracking.tmp.cleanup()
+            assert len(tracking.runs) == 2, "Runs weren't appended to the history."
+            assert [row["run_id"] for row in tracking.history] == [
+                saved["id"] for saved in tracking.runs
+            ], "A node's history doesn't span both runs."
+            assert all(row["value"] > 0 for row in tracking.history), "Stat wasn't kept."
+            assert tracking.succeeded == [1, 1]
+
+        with goal("nodes are held to their budgets") as budgeted:
+            with requirement("spin past the budget", budget=0.1) as spinner:
+                spinner.ignore()
+                budgeted.spinner = spinner
+                with requirement("children inherit the deadline") as child:
+                    budgeted.inherited = child.remaining
+                    while True:
+                        pass
+            with requirement("the run continues with the next sibling"):
+                timeout = budgeted.spinner.exceptions[0]
+                assert timeout.kind == "IgnoredNodeTimeout", "Timeout wasn't recorded."
+                assert timeout.line, "Timeout wasn't located in the test body."
+                assert 0 < budgeted.inherited <= 0.1, "Deadline wasn't inherited."
+
+        with goal("buffered writes are flushed before reads") as buffered:
+            db = buffered.db
+            settings = db.buffer_size, db.checkpoint_interval
+            db.buffer_size, db.checkpoint_interval = 1000, None
+            with requirement("node written while buffering") as queued:
+                buffered.queued = queued  # save for the read below
+            assert db.buffered(), "Writes weren't buffered."
+            assert db.node(buffered.queued.id)["succeeded"] == 1
+            assert not db.buffered(), "Read didn't flush pending writes."
+            db.buffer_size, db.checkpoint_interval = settings
+
+        with goal("writes can be applied on a background thread") as writing:
+            import tempfile
+            from anaphora.db import QueryAPI, Writer
+
+            with requirement("writer errors are raised until it stops"):
+                writer = Writer(2)
+                writer.applied = []
+
+                def broken():
+                    raise IOError("intentional error")
+
+                for work in (broken, lambda: writer.applied.append(1)):
+                    writer.put(work)
+                writing.raised = []
+                for attempt in (writer.wait, lambda: writer.put(print), writer.stop):
+                    try:
+                        attempt()
+                    except IOError:
+                        writing.raised.append(attempt)
+                assert len(writing.raised) == 3, "A writer error was swallowed."
+                assert not writer.applied, "Work ran after the writer failed."
+
+            writing.tmp = tempfile.TemporaryDirectory()
+            for command in requirement("save a run through the writer").commands(
+                [
+                    "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.stored -s track -w 1 -b 1".format(
+                        writing.tmp.name, os.getcwd(), sys.executable
+                    )
+                ]
+            ):
+                command.run()
+            saved = QueryAPI.open(os.path.join(writing.tmp.name, "tests.stored-track.db"))
+            writing.nodes = saved.execute("SELECT count(*) FROM nodes;").fetchone()[0]
+            writing.exceptions = saved.execute(
+                "SELECT e_class FROM exceptions;"
+            ).fetchall()
+            writing.history = saved.history(
+                saved.execute("SELECT key FROM nodes WHERE id=2;").fetchone()[0],
+                "succeeded",
+            ).fetchall()
+            saved.close()
+            writing.tmp.cleanup()
+            assert writing.nodes == 8, "Queued nodes were lost."
+            assert [row["e_class"] for row in writing.exceptions] == ["TestFailure"]
+            assert [row["value"] for row in writing.history] == [1]
+
+        with goal("the columnar store records the same tree") as storing:
+            import tempfile
+            from anaphora.db import QueryAPI
+
+            try:
+                import numpy
+            except ImportError:
+                storing.skip()  # the columnar store is an optional extra
+            storing.tmp = tempfile.TemporaryDirectory()
+            storing.saved = {}
+            for store in ("sqlite", "columnar"):
+                os.mkdir(os.path.join(storing.tmp.name, store))
+            run = "cd {}/{{0}} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.stored -s replace -b 2 --store {{0}}".format(
+                storing.tmp.name, os.getcwd(), sys.executable
+            )
+            for command in requirement("save a suite with each store").commands(
+                [run.format("sqlite"), run.format("columnar")]
+            ):
+                command.run()
+            for store in ("sqlite", "columnar"):
+                saved = QueryAPI.open(os.path.join(storing.tmp.name, store, "tests.stored.db"))
+                storing.saved[store] = [
+                    tuple(row)
+                    for row in saved.execute(
+                        "SELECT id, description, parent_id, depth, path, key, unit, succeeded, child_succeeded, ignore, child_ignore FROM nodes ORDER BY id;"
+                    )
+                ]
+                saved.close()
+            assert len(storing.saved["columnar"]) == 8, "Nodes weren't exported."
+            assert storing.saved["columnar"] == storing.saved["sqlite"], "Stores disagree."
+
+            for command in requirement("export lazily, aggregating children that exit late").commands(
+                [
+                    "cd {}/columnar && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.late -s replace -b 1 --store columnar".format(
+                        storing.tmp.name, os.getcwd(), sys.executable
+                    )
+                ]
+            ):
+                command.run()
+            saved = QueryAPI.open(os.path.join(storing.tmp.name, "columnar", "tests.late.db"))
+            storing.module, storing.cls = saved.execute(
+                "SELECT during, child_during, succeeded, child_succeeded FROM nodes WHERE description IN (?, ?) ORDER BY id;",
+                ("tests.test_classes", "tests.test_classes.JustMethods"),
+            ).fetchall()
+            saved.close()
+            storing.tmp.cleanup()
+            # during aggregates the time spent in children, down to the methods
+            assert storing.module["child_during"] is not None, "A late child wasn't aggregated."
+            assert storing.module["child_during"] == storing.cls["child_during"]
+            assert storing.module["child_succeeded"] == (
+                storing.cls["succeeded"] + storing.cls["child_succeeded"]
+            )
+
+        with goal("runs are persisted to their save file") as saving:
+            import tempfile
+            from anaphora.db import QueryAPI
+
+            db = saving.db
+            settings = db.dbname, db.tracking, db.checkpoint_interval
+            saving.tmp = tempfile.TemporaryDirectory()
+            saving.target = os.path.join(saving.tmp.name, "saved.db")
+            db.dbname, db.tracking, db.checkpoint_interval = saving.target, False, 0
+            with requirement("checkpoint while the run goes on") as checkpointed:
+                saving.checkpointed = checkpointed
+            db.execute("SELECT 1;")  # wait out a checkpoint queued to a writer
+            db.dbname, db.tracking, db.checkpoint_interval = settings
+            saved = QueryAPI.open(saving.target)
+            saving.row = saved.node(saving.checkpointed.id)
+            saving.analyzed = saved.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name='sqlite_stat1';"
+            ).fetchone()[0]
+            saved.close()
+            assert saving.row["succeeded"] == 1, "Checkpoint missed a finished node."
+            assert not saving.analyzed, "Checkpoints shouldn't pay for ANALYZE."
+
+            db.dbname, db.tracking = saving.target, False
+            db.persist(final=True)
+            db.execute("SELECT 1;")
+            db.dbname, db.tracking = settings[:2]
+            saved = QueryAPI.open(saving.target)
+            saving.analyzed = saved.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name='sqlite_stat1';"
+            ).fetchone()[0]
+            saved.close()
+            saving.tmp.cleanup()
+            assert saving.analyzed, "The final save wasn't analyzed."
+
+        with goal("results databases can be merged") as merging:
+            import os
+            import sqlite3
+            import tempfile
+            from anaphora.merge import merge
+
+            merging.db.execute("SELECT 1;")  # flush anything pending
+            with tempfile.TemporaryDirectory() as tmp:
+                sources = [os.path.join(tmp, name) for name in ("a.db", "b.db")]
+                for source in sources:
+                    copy = sqlite3.connect(source)
+                    merging.db.backup(copy)
+                    copy.close()
+                merge(os.path.join(tmp, "merged.db"), sources)
+                merged = sqlite3.connect(os.path.join(tmp, "merged.db"))
+                roots = merged.execute(
+                    "SELECT count(*) FROM nodes WHERE parent_id=1;"
+                ).fetchone()[0]
+                nodes = merged.execute("SELECT count(DISTINCT id) FROM nodes;").fetchone()[0]
+                merged.close()
+            assert roots == 2, "Merged roots weren't grafted under one run."
+            assert nodes == 2 * merging.db.execute("SELECT count(*) FROM nodes;").fetchone()[0] + 1
+
+            merging.tmp = tempfile.TemporaryDirectory()
+            merging.sources = [os.path.join(merging.tmp.name, name) for name in "ab"]
+            for source in merging.sources:
+                os.mkdir(source)
+            for command in requirement("save finished runs to merge").commands(
+                [
+                    "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.stored -s replace".format(
+                        source, os.getcwd(), sys.executable
+                    )
+                    for source in merging.sources
+                ]
+            ):
+                command.run()
+            merging.source_rows = []
+            for source in merging.sources:
+                saved = sqlite3.connect(os.path.join(source, "tests.stored.db"))
+                merging.source_rows.append(
+                    saved.execute(
+                        "SELECT during, child_during, succeeded, child_succeeded FROM nodes ORDER BY id;"
+                    ).fetchall()
+                )
+                saved.close()
+            merge(
+                os.path.join(merging.tmp.name, "merged.db"),
+                [os.path.join(source, "tests.stored.db") for source in merging.sources],
+            )
+            merged = sqlite3.connect(os.path.join(merging.tmp.name, "merged.db"))
+            merging.merged_rows = merged.execute(
+                "SELECT during, child_during, succeeded, child_succeeded FROM nodes ORDER BY id;"
+            ).fetchall()
+            merged.close()
+            merging.tmp.cleanup()
+
+            with requirement("child stats are recomputed like the runs computed them"):
+                root, grafted = merging.merged_rows[0], merging.merged_rows[1:]
+                expected = merging.source_rows[0] + merging.source_rows[1]
+                assert len(grafted) == len(expected), "Nodes were lost in the merge."
+                for ours, theirs in zip(grafted, expected):
+                    assert ours[0] == theirs[0] and ours[2] == theirs[2]
+                    for column in (1, 3):
+                        assert (ours[column] is None) == (theirs[column] is None)
+                        assert abs((ours[column] or 0) - (theirs[column] or 0)) < 1e-9
+                roots = [rows[0] for rows in merging.source_rows]
+                assert root[1] > 0, "The merged root's child_during wasn't aggregated."
+                assert abs(root[1] - sum(row[1] for row in roots)) < 1e-9
+                assert root[3] == sum(row[3] + (row[2] or 0) for row in roots)
+
+    with need("queryable coverage statistics") as covering:
+        from anaphora.db import QueryAPI
+        import tempfile
+
+        covering.tmp = tempfile.TemporaryDirectory()
+        covering.runs = []
+        run = "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.covered -s replace --cover ".format(
+            covering.tmp.name, os.getcwd(), sys.executable
+        )
+        for command in goal("coverage statistics are computed as tests run").commands(
+            [run + os.getcwd(), run + "{0}/anaphora {0}/tests".format(os.getcwd())]
+        ):
+            command.run()
+            db = QueryAPI.open(os.path.join(covering.tmp.name, "tests.covered.db"))
+            covering.runs.append(
+                {
+                    node["description"]: db.coverage(node["id"])
+                    for node in db.nodes()
+                }
+            )
+            db.close()
+        covering.tmp.cleanup()
+
+        covering.marked = {}
+        with open("tests/covered.py") as source:
+            for number, line in enumerate(source, 1):
+                covering.marked.setdefault(line.rpartition("# ")[2].strip(), []).append(number)
+        covered = os.path.abspath("tests/covered.py")
+        outer, inner = covering.runs[0]["outer"], covering.runs[0]["inner"]
+
+        with goal("coverage statistics are attributed to nodes"):
+            with requirement("lines belong to the innermost node running them"):
+                assert set(covering.marked["inner"]) <= set(inner[covered])
+                assert not set(covering.marked["outer"]) & set(inner[covered])
+            with requirement("lines that never ran aren't covered"):
+                assert covering.marked["never"][0] not in outer[covered]
             with requirement(
                 "anaphora's files only get included "
                 "when they are being intentionally tested"
             ):
-                ...
-            with requirement("stubbeh"):
-                ...
+                assert all("anaphora" not in path.split(os.sep)[-2] for path in outer)
+                assert any(
+                    path.endswith(os.path.join("anaphora", "runners.py"))
+                    for path in covering.runs[1]["outer"]
+                ), "Anaphora's files weren't covered when asked for."
+
         with goal("coverage statistics may be queried after tests run"):
-            ...  # this is an absurd thing to test at this point, no?
+            with requirement("a node's coverage includes its descendants'"):
+                assert set(outer[covered]) >= set(inner[covered]) | set(
+                    covering.marked["outer"]
+                )
 
     with need("integrate other types of tests with anaphora run"):
         with goal("run test functions from additional modules"):
@@ -146,8 +600,179 @@ with app("Anaphora").grammar(["need", "goal", "requirement"]):
                 .functions(lambda x: x == "test2")
             ):
                 wert = func.run(wert)
+                loaded = func.parent
             assert wert == 10, "Imported function didn't run successfully."
 
+            with requirement("report loaded modules by name") as reporting:
+                from anaphora.reporters import Tree
+
+                row = next(row for row in reporting.db.tree() if row["id"] == loaded.id)
+                assert row["description"] == "tests.test3"
+                assert Tree().format_node(row).endswith("Module: tests.test3")
+
+        with goal("run test functions in worker processes") as pooled:
+            pooled.funcs, pooled.ran = {}, {}
+            for func in (
+                requirement("run functions in a process pool")
+                .load(["tests.test_parallel", "tests.slow_parallel"])
+                .functions()
+                .parallel(workers=2)
+            ):
+                pooled.funcs[func.test.__name__] = func
+                if func.test.__name__ == "fails_in_worker":
+                    func.ignore()
+                    try:
+                        func.run()
+                    except TestFailure:
+                        pass  # runners re-raise failures; we only want it recorded
+                elif func.test.__name__ == "runs_in_worker":
+                    pooled.pid = func.run()
+                elif func.test.__name__.startswith("sleeps_"):
+                    pooled.ran[func.test.__name__] = func.run()
+                else:
+                    func.run()
+
+            with requirement("outcomes are shipped back from the workers"):
+                assert pooled.pid != os.getpid(), "Function didn't run in a worker."
+                failure = pooled.funcs["fails_in_worker"].exceptions[0]
+                assert failure.kind == "IgnoredTestFailure"
+                assert failure.output == "failed in a worker"
+                assert failure.line == 12, "Failure wasn't located in the worker."
+
+            with requirement("modules stay open while their functions run"):
+                for name in ("runs_in_worker", "sleeps_in_worker"):
+                    func = pooled.funcs[name]
+                    module, ran = pooled.db.execute(
+                        "SELECT during, child_during FROM nodes WHERE id IN (?, ?) ORDER BY id;",
+                        (func.parent.id, func.id),
+                    ).fetchall()
+                    assert func.parent.id < func.id, "The function was recorded before its module."
+                    assert module["child_during"] is not None, "Module closed before its functions ran."
+                    assert module["during"] >= ran["during"]
+                assert pooled.funcs["sleeps_in_worker"].parent.id > pooled.funcs["fails_in_worker"].id, "Modules were started together."
+                slow = pooled.funcs["sleeps_in_worker"].parent.id
+                assert pooled.db.execute(
+                    "SELECT during FROM nodes WHERE id=?;", (slow,)
+                ).fetchone()["during"] >= 0.05, "Module didn't wait for its function."
+
+            with requirement("submit the next module's functions before this one's finish"):
+                first_start, first_end = pooled.ran["sleeps_in_first_module"]
+                second_start, second_end = pooled.ran["sleeps_in_worker"]
+                assert second_start < first_end, "The next module waited for this one to drain."
+
+        with goal("discover tests without importing them") as discovering:
+            import tempfile
+            from anaphora.discovery import Index
+            from anaphora.runners import Module
+
+            discovering.options["static_discovery"] = True
+            discovering.tmp = tempfile.TemporaryDirectory()
+            Module.index = Index(os.path.join(discovering.tmp.name, "index.json"))
+
+            for func in (
+                requirement("skip modules with nothing selected")
+                .load(["tests.unimported"])
+                .functions(lambda name: False)
+            ):
+                func.run()
+
+            discovering.ran = [
+                func.run(1)
+                for func in requirement("import modules with selected tests")
+                .load(["tests.test3"])
+                .functions(lambda name: name == "test2")
+            ]
+            assert discovering.ran == [2], "Discovered function didn't run."
+            assert "tests/test3.py" in "".join(Module.index.entries), "Index missed."
+
+            with requirement("write the index once, at the end of the run"):
+                assert not os.path.exists(Module.index.path), "Index was saved per entry."
+                Module.index.save()  # what clean_up() does
+                assert Index(Module.index.path).entries == Module.index.entries
+
+            discovering.options["static_discovery"] = False
+            Module.index = None
+            discovering.tmp.cleanup()
+
+        with goal("run only modules affected by changed files") as impacting:
+            import tempfile
+            from anaphora.discovery import Impact, Index
+            from anaphora.runners import Module, Noun
+
+            impacting.tmp = tempfile.TemporaryDirectory()
+            Module.index = Index(os.path.join(impacting.tmp.name, "index.json"))
+            with requirement("follow relative imports and their packages"):
+                impacting.loads = Impact([], Module.index).files("tests.uses_leaf")
+                assert os.path.abspath("tests/leaf.py") in impacting.loads
+                assert os.path.abspath("tests/__init__.py") in impacting.loads
+
+            impacting.options["changed"] = ["tests/leaf.py"]
+            impacting.ran = [
+                func.run()
+                for func in requirement("skip modules that don't import a changed file")
+                .load(["tests.uses_leaf", "tests.unimported"])
+                .functions()
+            ]
+            assert impacting.ran == [1], "Affected module didn't run."
+            assert impacting.unaffected == 1, "Unaffected module wasn't skipped."
+
+            impacting.options["changed"] = None
+            Noun._impact = None
+            Noun._unaffected.clear()
+            Module.index = None
+            impacting.tmp.cleanup()
+
+        with goal("reuse cached results of unchanged tests") as caching:
+            import pickle
+            import tempfile
+            from anaphora.cache import ResultCache
+
+            caching.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(caching.tmp.name, "log")
+            caching.depends = os.path.join(caching.tmp.name, "depends")
+            with open(caching.depends, "w") as depends:
+                depends.write("1")
+            run = "cd {} && ANAPHORA_TEST_VALUE={{}} PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.cached".format(
+                caching.tmp.name, os.getcwd(), sys.executable
+            )
+            caching.values = ["5", "5", "6", "5", "x", "5", "5"]
+            caching.runs = []
+            for command in requirement("cache results across runs").commands(
+                [run.format(value) for value in caching.values[:-1]]
+                + [run.format(caching.values[-1]) + " --no-cache"]
+            ):
+                if len(caching.runs) == 3:
+                    with open(caching.depends, "w") as depends:
+                        depends.write("2")
+                command.run()
+                with open(log) as ran:
+                    caching.runs.append([line.split() for line in ran.read().splitlines()])
+                os.unlink(log)
+            del os.environ["ANAPHORA_TEST_LOG"]
+            modules = [run[0] for run in caching.runs]
+            values = [run[1][0] for run in caching.runs]
+            hits = [run[1][1] == "True" for run in caching.runs]
+
+            with requirement("modules are imported every run, never replayed"):
+                assert modules == [["False", "True"]] * len(caching.runs)
+            with requirement("unchanged runs are replayed from the cache"):
+                assert values == ["6", "6", "7", "6", "None", "6", "6"]
+                assert hits[:3] == [False, True, False], "Cache missed or misfired."
+            with requirement("changed dependencies and failures invalidate it"):
+                assert hits[3:6] == [False, False, False], "Stale result replayed."
+            with requirement("--no-cache runs cached runners anyway"):
+                assert not hits[6], "Cached result replayed despite --no-cache."
+            with requirement("least recently used results are evicted"):
+                caching.results = ResultCache(
+                    os.path.join(caching.tmp.name, "evicting.db"), limit=len(pickle.dumps(0)) * 2
+                )
+                for key in "abc":
+                    caching.results.put(key, "evicted", 0, 0)
+                assert caching.results.get("a") is None and caching.results.get("c")
+                caching.results.close()
+
+            caching.tmp.cleanup()
+
         with goal("run test methods on additional classes"):
             for method in (
                 requirement("chain selectors to run all " + "matching class methods")
@@ -183,10 +808,228 @@ with app("Anaphora").grammar(["need", "goal", "requirement"]):
             assert garol.test.i_swear_i_am_the_external_tests() == True
 
         for garol in requirement("run another executable as a test").commands(
-            ["flake8 anaphora"]  # --ignore=W191
+            ["flake8 anaphora"],  # --ignore=W191
+            depends=["anaphora/**/*.py", ".flake8"],
+            env=["PATH"],
         ):
             garol.run()
 
+        with goal("skip executables whose inputs haven't changed") as skipping:
+            import tempfile
+            from anaphora.cache import ResultCache
+            from anaphora.runners import Noun
+
+            skipping.no_cache, skipping.options["no_cache"] = skipping.options.get("no_cache"), False
+            skipping.tmp = tempfile.TemporaryDirectory()
+            Noun._results = ResultCache(os.path.join(skipping.tmp.name, "cache.db"))
+            skipping.inputs = os.path.join(skipping.tmp.name, "inputs")
+            os.mkdir(skipping.inputs)
+            with open(os.path.join(skipping.inputs, "input"), "w") as given:
+                given.write("input")
+            skipping.runs = []
+            for attempt in range(4):
+                if attempt == 2:
+                    os.environ["ANAPHORA_TEST_INPUT"] = "changed"
+                if attempt == 3:
+                    with open(os.path.join(skipping.inputs, "input"), "a") as given:
+                        given.write("changed")
+                for command in requirement("cache a command's status and output").commands(
+                    ["cat {}/input".format(skipping.inputs)],
+                    depends=[os.path.join(skipping.inputs, "*")],
+                    env=["ANAPHORA_TEST_INPUT"],
+                ):
+                    skipping.runs.append((command.run(), command.cached_duration))
+            del os.environ["ANAPHORA_TEST_INPUT"]
+            Noun._results.close()
+            Noun._results = None
+            skipping.tmp.cleanup()
+            skipping.options["no_cache"] = skipping.no_cache
+
+            assert skipping.runs[1][0] == skipping.runs[0][0] == (0, "input")
+            assert [duration is not None for _, duration in skipping.runs] == [
+                False,
+                True,
+                False,
+                False,
+            ], "Cached command was run, or changed inputs weren't."
+            assert skipping.cache_counts["hit"], "Cache hits weren't counted."
+
+        with goal("run executables concurrently") as concurrently:
+            concurrently.ran = [
+                command.run()
+                for command in requirement("run commands in a thread pool").commands(
+                    ["sleep 0.2; echo first", "sleep 0.2; echo second"], concurrency=2
+                )
+            ]
+            assert [output for _, output in concurrently.ran] == ["first", "second"]
+            assert (
+                concurrently.runtime.check().total_seconds() < 0.4
+            ), "Commands didn't run concurrently."
+
+        with goal("runaway executables are contained") as contained:
+            for command in requirement("kill commands that hang").commands(
+                ["sleep 5 & sleep 5"], timeout=0.2
+            ):
+                command.ignore()
+                command.run()
+                contained.hung = command
+            failure = contained.hung.exceptions[0]
+            assert "timeout after 0.2s" in failure.problem, "Command wasn't killed."
+            assert contained.runtime.check().total_seconds() < 2
+
+            for command in requirement("spool long output to disk").commands(
+                ["python -c 'print(\"x\" * 10000)'; exit 1"]
+            ):
+                command.ignore()
+                command.output_limit = 1000
+                command.run()
+                contained.spooled = command
+            failure = contained.spooled.exceptions[0]
+            assert len(failure.output) < 2000, "Output wasn't truncated."
+            with open(failure.spool) as spool:
+                assert len(spool.read()) == 10001, "Full output wasn't spooled."
+            os.unlink(failure.spool)
+
+        with goal("split runs into shards") as sharding:
+            import tempfile
+
+            sharding.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(sharding.tmp.name, "log")
+            for command in requirement("run each shard of a suite").commands(
+                [
+                    "{} -c 'from anaphora.cli import main; main()' tests.sharded --shard {}/2".format(
+                        sys.executable, index
+                    )
+                    for index in (1, 2)
+                ]
+            ):
+                command.run()
+                with open(log) as ran:
+                    sharding.ran = getattr(sharding, "ran", []) + [ran.read()]
+                os.unlink(log)
+            del os.environ["ANAPHORA_TEST_LOG"]
+            sharding.tmp.cleanup()
+            first, second = sharding.ran
+            assert not set(first) & set(second), "A unit ran in both shards."
+            assert "".join(sorted(first + second)) == "abcdefgh", "A unit didn't run."
+
+            with requirement("balance shards by previous timings"):
+                from anaphora.sharding import Plan
+
+                plan = Plan(2, {"a": 5.0, "b": 3.0, "c": 2.0, "d": 1.0}, default=4.0)
+                assert [plan.shard(key) for key in "abcde"] == [0, 1, 1, 0, 1]
+                assert plan.loads == [6.0, 9.0], "Shards weren't packed longest first."
+
+            sharding.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(sharding.tmp.name, "log")
+            run = "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.sharded".format(
+                sharding.tmp.name, os.getcwd(), sys.executable
+            )
+            sharding.timed = []
+            for command in requirement("shard a saved run by its timings").commands(
+                [run + " -s replace"]
+                + [
+                    run + " --shard {}/2 --shard-timings tests.sharded.db".format(index)
+                    for index in (1, 2)
+                ]
+            ):
+                command.run()
+                with open(log) as ran:
+                    sharding.timed.append(ran.read())
+                os.unlink(log)
+            del os.environ["ANAPHORA_TEST_LOG"]
+            with requirement("read saved timings from any path"):
+                import shutil
+
+                from anaphora.sharding import Plan
+
+                saved = os.path.join(sharding.tmp.name, "tests.sharded.db")
+                odd = os.path.join(sharding.tmp.name, "odd?#%20.db")
+                shutil.copy(saved, odd)
+                assert Plan.read(odd) == Plan.read(saved), "Read the wrong database."
+                assert len(Plan.read(odd)) == 8
+            sharding.tmp.cleanup()
+            saved, first, second = sharding.timed
+            assert saved == "abcdefgh", "The saved run didn't run every unit."
+            assert first and second, "A shard was left empty."
+            assert not set(first) & set(second), "A unit ran in both timed shards."
+            assert "".join(sorted(first + second)) == "abcdefgh", "A unit missed its timed shard."
+
+        with goal("stop early after too many failures") as stopping:
+            import tempfile
+
+            stopping.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(stopping.tmp.name, "log")
+            for command in requirement("stop after the first failure").commands(
+                [
+                    "{} -c 'from anaphora.cli import main; main()' tests.failing -x".format(
+                        sys.executable
+                    )
+                ]
+            ):
+                command.ignore()
+                stopping.status, stopping.output = command.run()
+                with open(log) as ran:
+                    stopping.ran = ran.read()
+            del os.environ["ANAPHORA_TEST_LOG"]
+            stopping.tmp.cleanup()
+            assert stopping.status, "A failing run passed."
+            assert stopping.ran == "ab", "Nodes ran after the run stopped."
+            assert "1 unignored exceptions; stopped early" in stopping.output
+            assert "unit: d" in stopping.output, "Skipped nodes weren't reported."
+
+        with goal("rerun what failed last time") as rerunning:
+            import tempfile
+
+            rerunning.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(rerunning.tmp.name, "log")
+            rerunning.ran = []
+            run = "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.failing".format(
+                rerunning.tmp.name, os.getcwd(), sys.executable
+            )
+            for command in requirement("save a failing run, then rerun it").commands(
+                [run + " -s replace", run + " --last-failed", run + " --failed-first"]
+            ):
+                command.ignore()
+                command.run()
+                with open(log) as ran:
+                    rerunning.ran.append(ran.read())
+                os.remove(log)
+            del os.environ["ANAPHORA_TEST_LOG"]
+            rerunning.tmp.cleanup()
+            assert rerunning.ran[0] == "abcdef", "The saved run was incomplete."
+            assert rerunning.ran[1] == "bcf", "--last-failed didn't run only failures."
+            # with-nodes run where they're written; only runners can be reordered
+            assert rerunning.ran[2] == "abcdfe", "--failed-first didn't run failures first."
+
+            rerunning.tmp = tempfile.TemporaryDirectory()
+            log = os.environ["ANAPHORA_TEST_LOG"] = os.path.join(rerunning.tmp.name, "log")
+            rerunning.unsaved = []
+            run = "cd {} && PYTHONPATH={}:$PYTHONPATH {} -c 'from anaphora.cli import main; main()' tests.failing".format(
+                rerunning.tmp.name, os.getcwd(), sys.executable
+            )
+            for command in requirement("rerun without a saved run").commands(
+                [
+                    run + " --last-failed",
+                    run + " --failed-first",
+                    run + " --last-failed=garbled.db",
+                ]
+            ):
+                if command.test.endswith("garbled.db"):
+                    with open(os.path.join(rerunning.tmp.name, "garbled.db"), "w") as garbled:
+                        garbled.write("not a database")
+                command.ignore()
+                status, output = command.run()
+                with open(log) as ran:
+                    rerunning.unsaved.append((ran.read(), output))
+                os.remove(log)
+            del os.environ["ANAPHORA_TEST_LOG"]
+            rerunning.tmp.cleanup()
+            for ran, output in rerunning.unsaved:
+                assert ran == "abcdef", "Everything didn't run without a saved run."
+                assert "running everything" in output, "Missing saved run wasn't warned about."
+                assert "OperationalError" not in output and "DatabaseError" not in output
+
         # temp disable
         # with goal("run earmarks") as marker:
         #     with requirement("only run tests that pass a version check") as lint:
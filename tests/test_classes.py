@@ -34,5 +34,13 @@ class MostlyMethods(object):
         assert self.test == 250000
 
 
+class Fixtured(object):
+    def test1(self, shared):
+        shared.append(1)
+
+    def test2(self, shared):
+        assert shared == [1]
+
+
 def ignore_this():
     assert 1 == 0
@@ -0,0 +1,18 @@
+import os
+import time
+
+
+def runs_in_worker():
+    print("ran in a worker")
+    return os.getpid()
+
+
+def fails_in_worker():
+    print("failed in a worker")
+    assert 1 == 0, "intentional failure"
+
+
+def sleeps_in_first_module():
+    start = time.time()
+    time.sleep(0.2)
+    return start, time.time()
@@ -0,0 +1,5 @@
+def never_selected():
+    pass
+
+
+raise ImportError("static discovery shouldn't import modules with nothing selected")
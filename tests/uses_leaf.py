@@ -0,0 +1,5 @@
+from . import leaf
+
+
+def test_leaf():
+    return leaf.value()